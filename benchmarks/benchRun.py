@@ -0,0 +1,155 @@
+#!/usr/bin/env python3
+# This is an end-to-end benchmark that runs main.py against the fake YouTube API
+# and the fake yt-dlp in this directory, for a few different numbers of channels,
+# and reports how long each run took, how many requests it made and its peak memory.
+# Run it from anywhere with:
+#   python3 benchmarks/benchRun.py --channels 10,1000,10000
+# Each scenario gets its own throwaway data directory, so nothing in your own
+# config, database or download path is touched. Coordinator mode can be checked with:
+#   python3 benchmarks/benchRun.py --channels 40 --workers 3 --kill-worker --download-duration 2 --match-every 1
+# which kills one of the workers partway through and fails unless every channel in
+# the work table still ends up done, handed out again once the dead worker's lease ran out
+import argparse, json, os, shutil, signal, sqlite3, subprocess, sys, tempfile, time
+
+sys.path.insert(0, os.path.dirname(os.path.realpath(__file__)))
+from fakeYoutubeApi import fakeYoutubeHandler, startServer
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__))
+MAIN = os.path.join(os.path.dirname(BENCH_PATH), "main.py")
+YTDLP = os.path.join(BENCH_PATH, "fakeYtDlp.py")
+
+def writeDataDir(path, channels, match_every):
+    # The script reads the first line of each of these files, so they're written without line breaks
+    config = {"channels": {}}
+    for i in range(channels):
+        titles = ["Video 0"] if i % match_every == 0 else ["Nothing Matches This"]
+        config["channels"][f"bench{i}"] = {"channelId": f"UCbench{i}", "titles": titles}
+    with open(os.path.join(path, "config.json"), "w") as file:
+        file.write(json.dumps(config))
+    with open(os.path.join(path, ".creds"), "w") as file:
+        file.write("fake-api-key")
+    with open(os.path.join(path, "client_secrets.json"), "w") as file:
+        file.write(json.dumps({"installed": {"client_id": "fake-client-id", "client_secret": "fake-client-secret"}}))
+    with open(os.path.join(path, "refresh_token.txt"), "w") as file:
+        file.write("fake-refresh-token")
+    os.mkdir(os.path.join(path, "downloads"))
+
+def getChildren(pid):
+    # Linux lists the processes each thread started, which is how we find the coordinator's workers
+    children = []
+    for task in os.listdir(f"/proc/{pid}/task"):
+        with open(f"/proc/{pid}/task/{task}/children") as file:
+            children.extend(int(child) for child in file.read().split())
+    return children
+
+def killWorker(process, delay):
+    # Wait for the workers to start and lease their first channels, then kill one of them without giving it a chance to clean up
+    deadline = time.monotonic() + delay
+    while time.monotonic() < deadline or len(getChildren(process.pid)) == 0:
+        if process.poll() is not None:
+            return None
+        time.sleep(0.1)
+    workers = getChildren(process.pid)
+    os.kill(workers[0], signal.SIGKILL)
+    return workers[0]
+
+def getWorkCounts(path):
+    with sqlite3.connect(os.path.join(path, "youtubeDL.db")) as db:
+        return dict(db.execute("SELECT state, COUNT(*) FROM work GROUP BY state").fetchall())
+
+def runScenario(path, url, args):
+    env = dict(os.environ)
+    env.update({
+        "YOUTUBEDL_DATA_DIR": path,
+        "YOUTUBEDL_API_URL": url,
+        "YOUTUBEDL_OAUTH_URL": url,
+        "YOUTUBEDL_FEED_URL": url,
+        "YOUTUBEDL_YTDLP": YTDLP,
+        "FAKE_YTDLP_SIZE": str(args.download_size),
+        "FAKE_YTDLP_DURATION": str(args.download_duration),
+        "YOUTUBEDL_LEASE_TIME": str(args.lease_time),
+        # The script compares publish times converted to Eastern time with the local time,
+        # so it has to run in Eastern time for the fake uploads to count as new releases
+        "TZ": "America/New_York"
+    })
+    cmd = [sys.executable, MAIN, "--download-path", os.path.join(path, "downloads"), "--daily-quota", "100000000",
+           "--max-workers", str(args.max_workers), "--max-downloads", str(args.max_downloads), "--discovery", args.discovery]
+    if args.workers is not None:
+        cmd.extend(["--coordinator", str(args.workers)])
+    fakeYoutubeHandler.counts = {}
+    start = time.perf_counter()
+    process = subprocess.Popen(cmd, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    killed = killWorker(process, args.kill_after) if args.kill_worker else None
+    # wait4 gives us the resource usage of this one process rather than of every child we've ever had
+    pid, status, usage = os.wait4(process.pid, 0)
+    duration = time.perf_counter() - start
+    process.returncode = os.waitstatus_to_exitcode(status)
+    result = {
+        "exitCode": process.returncode,
+        "seconds": round(duration, 3),
+        "requests": sum(fakeYoutubeHandler.counts.values()),
+        "endpoints": dict(sorted(fakeYoutubeHandler.counts.items())),
+        "peakMemoryMB": round(usage.ru_maxrss / 1024, 1), # ru_maxrss is in kilobytes on Linux
+        "downloads": len(os.listdir(os.path.join(path, "downloads")))
+    }
+    if args.workers is not None:
+        result.update({"killedWorker": killed, "work": getWorkCounts(path)})
+    return result
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", default="10,1000,10000", help="a comma separated list of how many channels each scenario has")
+    parser.add_argument("--runs", type=int, default=2, help="how many times to run each scenario against the same data directory, the first run is cold and the rest are warm")
+    parser.add_argument("--match-every", type=int, default=10, help="one in this many channels has a title that matches its newest upload")
+    parser.add_argument("--videos", type=int, default=5, help="how many recent uploads each fake channel has")
+    parser.add_argument("--latency", type=float, default=0.0, help="how many seconds the fake API adds to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the fraction of fake API requests that fail with an HTTP 503")
+    parser.add_argument("--download-size", type=int, default=1048576, help="how many bytes each fake download writes")
+    parser.add_argument("--download-duration", type=float, default=0.0, help="how many seconds each fake download takes")
+    parser.add_argument("--max-workers", type=int, default=8, help="passed through to main.py")
+    parser.add_argument("--max-downloads", type=int, default=2, help="passed through to main.py")
+    parser.add_argument("--discovery", choices=["api", "rss"], default="api", help="passed through to main.py")
+    parser.add_argument("--workers", type=int, help="run main.py in coordinator mode with this many local workers")
+    parser.add_argument("--kill-worker", action="store_true", help="kill one of the workers partway through each run, which needs --workers")
+    parser.add_argument("--kill-after", type=float, default=1.0, help="how many seconds after the workers start to kill one of them")
+    parser.add_argument("--lease-time", type=float, default=5.0, help="how many seconds a worker's lease on a channel lasts, so a killed worker's channels are handed out again quickly")
+    parser.add_argument("--json", help="also write the results to this file as JSON")
+    parser.add_argument("--keep", action="store_true", help="keep each scenario's data directory (including youtubeDL.log) instead of deleting it")
+    args = parser.parse_args()
+    if args.kill_worker and args.workers is None:
+        parser.error("--kill-worker needs --workers")
+
+    server = startServer(latency=args.latency, error_rate=args.error_rate, videos=args.videos)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    results = []
+    for channels in [int(i) for i in args.channels.split(",")]:
+        path = tempfile.mkdtemp(prefix=f"youtubeDL-bench-{channels}-")
+        writeDataDir(path, channels, args.match_every)
+        for run in range(1, args.runs + 1):
+            result = runScenario(path, url, args)
+            result.update({"channels": channels, "run": run})
+            results.append(result)
+            print(f"{channels} channels, run {run}: {result['seconds']:.2f}s :: exit code {result['exitCode']} :: {result['requests']} requests :: {result['downloads']} downloads :: {result['peakMemoryMB']} MB peak memory")
+            print(f"    {result['endpoints']}")
+            if args.workers is not None:
+                print(f"    Work queue: {result['work']} :: Killed worker: {result['killedWorker']}")
+        if args.keep:
+            print(f"    Data directory: {path}")
+        else:
+            shutil.rmtree(path)
+    server.shutdown()
+
+    if args.json is not None:
+        with open(args.json, "w") as file:
+            json.dump(results, file, indent=2)
+    if any(result["exitCode"] != 0 for result in results):
+        exit(1)
+    if args.workers is not None and any(set(result["work"]) != {"done"} for result in results):
+        print("ERROR: Not every channel in the work queue ended up done!")
+        exit(1)
+    if args.kill_worker and any(result["killedWorker"] is None for result in results):
+        print("ERROR: The run finished before a worker could be killed!")
+        exit(1)
+
+if __name__ == "__main__":
+    main()
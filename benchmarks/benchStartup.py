@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# This is a startup benchmark that runs main.py with python -X importtime for the
+# commands that should start quickly, and fails if they import too much. Run it from
+# anywhere with:
+#   python3 benchmarks/benchStartup.py --budget 60
+# Each command gets its own throwaway data directory, so nothing in your own config
+# or database is touched. It exits with 1 if a command went over the budget or loaded
+# one of the modules that only a full run needs, so it can be used as a check
+import argparse, json, os, subprocess, sys, tempfile
+
+BENCH_PATH = os.path.dirname(os.path.realpath(__file__))
+MAIN = os.path.join(os.path.dirname(BENCH_PATH), "main.py")
+COMMANDS = [["--help"], ["--config", "list"]]
+# None of these are needed to change the config, they're only for talking to YouTube and downloading
+HEAVY = ["requests", "urllib3", "pytz", "yt_dlp", "multiprocessing", "youtubeDL", "youtubeOauth", "youtubeEngine"]
+
+def parseImportTime(stderr):
+    # Each line looks like "import time: <self us> | <cumulative us> | <indented module name>", and a
+    # module's line comes after the lines of everything it imported. Everything the interpreter imports
+    # for itself is done by the time "site" shows up, so only the top level imports after it are counted
+    total = 0
+    modules = []
+    started = False
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not started:
+            started = name.strip() == "site"
+            continue
+        modules.append(name.strip())
+        if not name[1:].startswith(" "): # Top level imports are only indented by the one space after the "|"
+            total += int(cumulative_us)
+    return total, modules
+
+def runCommand(path, command):
+    env = dict(os.environ)
+    env["YOUTUBEDL_DATA_DIR"] = path
+    process = subprocess.run([sys.executable, "-X", "importtime", MAIN] + command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    total, modules = parseImportTime(process.stderr)
+    return process.returncode, total, modules
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--budget", type=float, default=60, help="how many milliseconds each command is allowed to spend importing modules")
+    parser.add_argument("--runs", type=int, default=5, help="how many times to run each command, the fastest run is the one that counts")
+    args = parser.parse_args()
+
+    failed = False
+    with tempfile.TemporaryDirectory() as path:
+        with open(os.path.join(path, "config.json"), "w") as file:
+            file.write(json.dumps({"channels": {"@SomeYouTuber": {"titles": []}}}))
+        for command in COMMANDS:
+            results = [runCommand(path, command) for i in range(args.runs)]
+            exit_code, total, modules = min(results, key=lambda result: result[1])
+            heavy = [module for module in HEAVY if module in modules]
+            milliseconds = total / 1000
+            print(f"main.py {' '.join(command)}: {milliseconds:.1f}ms importing {len(modules)} modules (budget {args.budget:.0f}ms)")
+            if exit_code != 0:
+                print(f"    ERROR: The command exited with {exit_code}!")
+                failed = True
+            if milliseconds > args.budget:
+                print("    ERROR: The command went over the import time budget!")
+                failed = True
+            if len(heavy) > 0:
+                print(f"    ERROR: The command imported modules it doesn't need: {', '.join(heavy)}")
+                failed = True
+    if failed:
+        exit(1)
+
+if __name__ == "__main__":
+    main()
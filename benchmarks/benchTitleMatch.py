@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# This is a microbenchmark comparing the old keyword-by-keyword title check
+# against the compiled youtubeMatcher. Run it from anywhere with:
+#   python3 benchmarks/benchTitleMatch.py --channels 200 --keywords 50 --videos 5
+import argparse, os, random, string, sys, time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+from youtubeMatcher import youtubeMatcher
+
+def randomWord(length):
+    return "".join(random.choice(string.ascii_lowercase) for i in range(length))
+
+def naiveMatch(titles, title):
+    # This is how youtubeDL._doesTitleMatch used to work
+    if len(titles) > 0:
+        for i in titles:
+            if i in title:
+                return True
+        return False
+    return True
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--channels", type=int, default=200, help="how many channels to simulate")
+    parser.add_argument("--keywords", type=int, default=50, help="how many title keywords each channel has")
+    parser.add_argument("--videos", type=int, default=5, help="how many video titles are checked per channel")
+    parser.add_argument("--rounds", type=int, default=20, help="how many times to repeat the whole run")
+    parser.add_argument("--seed", type=int, default=1, help="the random seed, so runs can be compared")
+    args = parser.parse_args()
+    random.seed(args.seed)
+
+    channels = []
+    for i in range(args.channels):
+        keywords = [randomWord(random.randint(4, 12)) for ii in range(args.keywords)]
+        titles = []
+        for ii in range(args.videos):
+            words = [randomWord(random.randint(3, 10)) for iii in range(8)]
+            if random.random() < 0.3:
+                words.insert(random.randint(0, len(words)), random.choice(keywords))
+            titles.append(" ".join(words))
+        channels.append((keywords, titles))
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        naive = [[naiveMatch(keywords, title) for title in titles] for keywords, titles in channels]
+    naive_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    matchers = [youtubeMatcher(keywords) for keywords, titles in channels]
+    compile_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for i in range(args.rounds):
+        compiled = [matcher.matchTitles(titles) for matcher, (keywords, titles) in zip(matchers, channels)]
+    compiled_time = time.perf_counter() - start
+
+    if naive != compiled:
+        print("ERROR: The compiled matcher does not agree with the naive matcher!")
+        exit(1)
+
+    checks = args.channels * args.videos * args.rounds
+    print(f"{args.channels} channels x {args.keywords} keywords x {args.videos} titles x {args.rounds} rounds ({checks} title checks)")
+    print(f"naive keyword loop: {naive_time:.4f}s ({naive_time / checks * 1e6:.2f}us per title)")
+    print(f"compiled matcher:   {compiled_time:.4f}s ({compiled_time / checks * 1e6:.2f}us per title) plus {compile_time:.4f}s to compile once")
+
+if __name__ == "__main__":
+    main()
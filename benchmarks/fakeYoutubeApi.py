@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+# This is a local stand-in for the parts of the YouTube Data API, the OAuth token
+# endpoint and the channel feeds that the script uses, so runs can be timed without
+# touching the real services or spending any quota. Point the script at it with:
+#   YOUTUBEDL_API_URL=http://127.0.0.1:8765 YOUTUBEDL_OAUTH_URL=http://127.0.0.1:8765 YOUTUBEDL_FEED_URL=http://127.0.0.1:8765
+# It can also be run on its own with:
+#   python3 benchmarks/fakeYoutubeApi.py --port 8765 --latency 0.05 --error-rate 0.01
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import argparse, json, random, threading, time
+
+class fakeYoutubeHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep connections open so the script's connection pool behaves like it does against the real API
+    latency = 0.0 # This many seconds are added to every response
+    error_rate = 0.0 # This fraction of API requests fail with an HTTP 503
+    videos = 5 # This is how many uploads each channel has, ten minutes apart starting from now
+    counts = {} # This counts how many requests were made to each endpoint
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handleRequest()
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length") or 0))
+        self.handleRequest()
+
+    def sendJson(self, code, body=None, headers={}):
+        data = b"" if body is None else json.dumps(body).encode()
+        self.send_response(code)
+        for key in headers:
+            self.send_header(key, headers[key])
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def getUploads(self, prefix):
+        now = datetime.now(timezone.utc)
+        return [(f"{prefix}v{i}", f"Video {i} of {prefix}", now - timedelta(minutes=10 * i)) for i in range(self.videos)]
+
+    def handleRequest(self):
+        url = urlsplit(self.path)
+        query = parse_qs(url.query)
+        endpoint = url.path.replace("/youtube/v3/", "", 1).lstrip("/")
+        with self.lock:
+            self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+        if self.latency > 0:
+            time.sleep(self.latency)
+        if endpoint == "_stats":
+            # This isn't part of the real API, it lets the benchmark read back the request counts
+            with self.lock:
+                self.sendJson(200, {key: value for key, value in self.counts.items() if key != "_stats"})
+            return
+        if endpoint != "token" and random.random() < self.error_rate:
+            self.sendJson(503, {"error": {"code": 503, "message": "The service is currently unavailable."}})
+            return
+
+        if endpoint == "channels":
+            ids = query["id"][0].split(",") if "id" in query else []
+            if "forHandle" in query:
+                ids = ["UC" + query["forHandle"][0].lstrip("@")]
+            self.sendJson(200, {"items": [{"id": i, "contentDetails": {"relatedPlaylists": {"uploads": "UU" + i[2:]}}} for i in ids if i != ""]})
+        elif endpoint == "playlistItems":
+            # The pageToken is just the index of the first video on the page, which is fine as long as nobody reads it
+            playlistId = query["playlistId"][0]
+            maxResults = int(query.get("maxResults", ["5"])[0])
+            first = int(query.get("pageToken", ["0"])[0])
+            etag = f'"{playlistId}-{self.videos}-{first}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.sendJson(304, headers={"ETag": etag})
+                return
+            uploads = self.getUploads(playlistId)
+            items = [{"snippet": {"publishedAt": published.strftime("%Y-%m-%dT%H:%M:%SZ"), "title": title, "resourceId": {"videoId": videoId}}} for videoId, title, published in uploads[first:first + maxResults]]
+            body = {"etag": etag, "items": items}
+            if first + maxResults < len(uploads):
+                body["nextPageToken"] = str(first + maxResults)
+            self.sendJson(200, body, {"ETag": etag})
+        elif endpoint == "search":
+            self.sendJson(200, {"items": [{"id": {"kind": "youtube#channel", "channelId": "UC" + query["q"][0]}}]})
+        elif endpoint == "videos":
+            # Every video is an ordinary ten minute HD upload that anyone can watch
+            self.sendJson(200, {"items": [{"id": i, "contentDetails": {"duration": "PT10M", "definition": "hd"}, "status": {"privacyStatus": "public", "uploadStatus": "processed"}} for i in query["id"][0].split(",")]})
+        elif endpoint == "videos/getRating":
+            self.sendJson(200, {"items": [{"videoId": i, "rating": "none"} for i in query["id"][0].split(",")]})
+        elif endpoint == "videos/rate":
+            self.sendJson(204)
+        elif endpoint == "token":
+            self.sendJson(200, {"access_token": "fake-access-token", "expires_in": 3599, "token_type": "Bearer"})
+        elif endpoint == "feeds/videos.xml":
+            channelId = query["channel_id"][0]
+            entries = "".join(f"<entry><yt:videoId>{videoId}</yt:videoId><title>{title}</title><published>{published.strftime('%Y-%m-%dT%H:%M:%S+00:00')}</published></entry>" for videoId, title, published in self.getUploads("UU" + channelId[2:]))
+            data = f'<?xml version="1.0" encoding="UTF-8"?><feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns="http://www.w3.org/2005/Atom">{entries}</feed>'.encode()
+            self.send_response(200)
+            self.send_header("Content-Type", "application/atom+xml")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+        else:
+            self.sendJson(404, {"error": {"code": 404, "message": "Not Found"}})
+
+def startServer(port=0, latency=0.0, error_rate=0.0, videos=5):
+    # Port 0 lets the operating system pick a free port, which is read back from server.server_address
+    fakeYoutubeHandler.latency = latency
+    fakeYoutubeHandler.error_rate = error_rate
+    fakeYoutubeHandler.videos = videos
+    fakeYoutubeHandler.counts = {}
+    server = ThreadingHTTPServer(("127.0.0.1", port), fakeYoutubeHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=8765, help="the port to listen on")
+    parser.add_argument("--latency", type=float, default=0.0, help="how many seconds to add to every response")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="the fraction of API requests that fail with an HTTP 503")
+    parser.add_argument("--videos", type=int, default=5, help="how many uploads each channel has, which are split into pages like the real API")
+    args = parser.parse_args()
+    server = startServer(args.port, args.latency, args.error_rate, args.videos)
+    print(f"Listening on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
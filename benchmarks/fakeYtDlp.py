@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# This is a stand-in for yt-dlp that takes the same arguments the script passes
+# to it, waits a while and writes a file of a set size instead of downloading
+# anything. Point the script at it with:
+#   YOUTUBEDL_YTDLP=/path/to/benchmarks/fakeYtDlp.py
+# The size (in bytes) and duration (in seconds) of each fake download are set with
+# the FAKE_YTDLP_SIZE and FAKE_YTDLP_DURATION environment variables
+import json, os, sys, time
+
+def getOption(args, name, default=None):
+    if name in args:
+        return args[args.index(name) + 1]
+    return default
+
+def printToFile(args, when, path):
+    # The real yt-dlp appends each --print-to-file template to its file at the given stage, this only fills in the file paths
+    for index in range(len(args)):
+        if args[index] == "--print-to-file" and args[index + 1].startswith(when + ":"):
+            template = args[index + 1][len(when) + 1:]
+            with open(args[index + 2], "a") as file:
+                file.write(template.replace("%(filename)s", path).replace("%(filepath)s", path) + "\n")
+
+def main():
+    args = sys.argv[1:]
+    size = int(os.environ.get("FAKE_YTDLP_SIZE", "1048576"))
+    duration = float(os.environ.get("FAKE_YTDLP_DURATION", "0"))
+    videoId = args[-1].split("v=")[-1]
+    path = os.path.abspath(os.path.join(getOption(args, "--path", "."), f"{videoId}.webm"))
+    if "--dump-json" in args:
+        # This is only the part of the info the script reads, as if the video and audio were separate formats
+        print(json.dumps({"id": videoId, "requested_formats": [{"filesize": size - size // 10}, {"filesize_approx": size // 10}]}))
+        return
+    print(f"[youtube] Extracting URL: {args[-1]}")
+    printToFile(args, "video", path)
+    time.sleep(duration)
+    with open(path, "wb") as file:
+        # Write in chunks so a large fake download doesn't need that much memory
+        remaining = size
+        while remaining > 0:
+            chunk = min(remaining, 1048576)
+            file.write(b"\0" * chunk)
+            remaining -= chunk
+    print(f"[download] Destination: {path}")
+    printToFile(args, "after_move", path)
+
+if __name__ == "__main__":
+    main()
@@ -1,58 +1,57 @@
 #!/usr/bin/env python3
-from youtubeDL import youtubeDL
-from youtubeOauth import youtubeOauth
 from youtubeLogger import youtubeLogger
-import time, argparse, os
+from youtubeChannels import youtubeChannels
+from youtubeMetrics import youtubeMetrics
+import time, argparse, os, subprocess, sys, threading
+# The rest of the classes are imported in main() once we know we aren't only changing the config,
+# so the config actions start quickly (check with: python3 benchmarks/benchStartup.py)
 
-def addConfig(config):
+def addConfig(channels):
     title_list = []
     name = input("Enter the Channel Name: ")
     titles = input("Enter in any Title keywords you want to filter on, separated by comma: ")
-    if name in config["channels"].keys():
+    if channels.getChannel(name) is not None:
         return False
     else:
-        if titles == "":
-            config["channels"].update({name: {"titles": []}})
-        else:
+        if titles != "":
             for i in titles.split(","):
                 title_list.append(i.strip())
-            config["channels"].update({name: {"titles": title_list}})
+        channels.saveChannel(name, {"titles": title_list})
         return True
 
-def updateConfig(config):
+def updateConfig(channels):
     title_list = []
     name = input("Enter the Channel Name to update: ")
     titles = input("Enter in any Title keywords you want to filter on, separated by comma: ")
     title_change = input("Do you want to append Title keywords or overwrite Title keywords? [append/update] ")
-    if name in config["channels"].keys():
+    config = channels.getChannel(name)
+    if config is not None:
         if title_change == "append":
             if titles == "":
-                config["channels"][name]["titles"] = []
+                config["titles"] = []
             else:
                 for i in titles.split(","):
                     title_list.append(i.strip())
-                config["channels"][name]["titles"].append(title_list)
+                config["titles"].extend(title_list)
+            channels.saveChannel(name, config)
             return True
         elif title_change == "update":
             if titles == "":
-                config["channels"][name]["titles"] = []
+                config["titles"] = []
             else:
                 for i in titles.split(","):
                     title_list.append(i.strip())
-                config["channels"][name]["titles"] = title_list
+                config["titles"] = title_list
+            channels.saveChannel(name, config)
             return True
         else:
             return False
     else:
         return False
 
-def deleteConfig(config):
+def deleteConfig(channels):
     name = input("Enter the Channel Name to remove: ")
-    if name in config["channels"].keys():
-        config["channels"].pop(name)
-        return True
-    else:
-        return False
+    return channels.deleteChannel(name)
 
 def testPath(path):
     if(os.path.exists(path)):
@@ -63,61 +62,222 @@ def testPath(path):
     else:
         return False
 
-def main():
+def exportMetrics(path, logger, start):
+    # Metrics are only collected when a metrics directory was given, so there is nothing to write otherwise
+    metrics = youtubeMetrics()
+    if path is None:
+        return
+    metrics.set("run_duration_seconds", time.monotonic() - start)
+    metrics.set("last_run_timestamp_seconds", time.time())
+    try:
+        metrics.export(path)
+        logger.logDebugMsg("DEBUG: Wrote the run metrics to: %s", path)
+    except OSError as e:
+        logger.logMsg("ERROR: Unable to write the run metrics!")
+        logger.logDebugMsg("DEBUG: Metrics Path: %s :: Exception Text: %s", path, e)
 
-    # Instantiate the first class
-    # This gives us access to the logging class
-    logger = youtubeLogger()
-    ytDL = youtubeDL()
+def runDaemon(ytDL, yto, logger, metrics_path=None):
+    from youtubeScheduler import youtubeScheduler
+    from youtubePipeline import youtubePipeline
+    # Instead of polling every channel every time, the scheduler learns how often each channel
+    # uploads and only hands back the channels that are due. Everything else (the config, the
+    # OAuth token and the network connections) stays loaded between polls, and the access token
+    # is refreshed in the background before it expires
+    scheduler = youtubeScheduler(ytDL._ledger, list(ytDL.video_data["channels"].keys()))
+    yto.startBackgroundRefresh()
+    logger.logMsg("Starting daemon mode for %s channels...", len(scheduler.next_poll))
+    try:
+        while True:
+            due = scheduler.getDueChannels()
+            if len(due) > 0:
+                start = time.monotonic()
+                logger.logMsg("There are %s channels due to be checked for new videos!", len(due))
+                ytDL.reset()
+                pipeline = youtubePipeline(ytDL, yto)
+                pipeline.run(due)
+                for i in due:
+                    scheduler.schedule(i)
+                exportMetrics(metrics_path, logger, start)
+            wait = scheduler.getSleepTime()
+            logger.logDebugMsg("DEBUG: Sleeping for %.0f seconds until the next channel is due...", wait)
+            time.sleep(wait)
+    except KeyboardInterrupt:
+        logger.logMsg("Daemon mode was interrupted! Bye bye!")
 
-    logger.logMsg("Starting script...")
+def runWorker(ytDL, yto, logger):
+    from youtubeWorkQueue import youtubeWorkQueue
+    from youtubePipeline import youtubePipeline
+    # A worker leases a few channels at a time from the queue the coordinator filled, checks them
+    # and downloads their new videos, and comes back for more until every channel is done. Everything
+    # it finds goes into the same database as every other worker, so there is nothing to merge afterwards
+    work = youtubeWorkQueue()
+    yto.startBackgroundRefresh()
+    logger.logMsg("Starting worker %s...", work.owner)
+    while True:
+        channels = work.claim(ytDL.max_workers)
+        if len(channels) == 0:
+            if work.isFinished():
+                break
+            # Every channel left is leased to another worker, so wait in case one of them dies
+            time.sleep(work.getWaitTime())
+            continue
+        logger.logMsg("Worker %s has leased %s channels!", work.owner, len(channels))
+        # Keep the leases from running out while the videos are downloading
+        done = threading.Event()
+        def renewLeases():
+            while not done.wait(work.RENEW_INTERVAL):
+                work.renew()
+        renewer = threading.Thread(target=renewLeases, name="lease-renewer", daemon=True)
+        renewer.start()
+        ytDL.reset()
+        pipeline = youtubePipeline(ytDL, yto)
+        # The coordinator picks up the leftovers from previous runs, so two workers never download the same video
+        pipeline.run(channels, leftovers=False)
+        done.set()
+        renewer.join()
+        for i in channels:
+            if i in ytDL.failed_channels:
+                work.fail(i)
+            else:
+                work.finish(i)
+    logger.logMsg("Worker %s is finished, there are no channels left to check!", work.owner)
+
+def getWorkerArgs(argv):
+    # The workers are started with the same options as the coordinator, apart from the ones only the coordinator uses
+    skip = ["--coordinator", "--metrics-dir"]
+    worker_args = ["--worker"]
+    index = 0
+    while index < len(argv):
+        if argv[index] in skip:
+            index += 2
+            continue
+        if argv[index].split("=")[0] not in skip:
+            worker_args.append(argv[index])
+        index += 1
+    return worker_args
+
+def runCoordinator(ytDL, logger, workers):
+    from youtubeWorkQueue import youtubeWorkQueue
+    # The coordinator fills the queue with every channel and starts the given number of worker processes
+    # on this machine. Workers on other machines can help by running main.py --worker against the same
+    # data directory (YOUTUBEDL_DATA_DIR on a shared filesystem), and the coordinator waits for all of them
+    work = youtubeWorkQueue()
+    channels = list(ytDL.video_data["channels"].keys())
+    work.enqueue(channels)
+    logger.logMsg("Queued %s channels for the workers to check!", len(channels))
+    cmd = [sys.executable, os.path.realpath(__file__)] + getWorkerArgs(sys.argv[1:])
+    processes = [subprocess.Popen(cmd) for i in range(workers)]
+    logger.logMsg("Started %s local workers!", len(processes))
+    while not work.isFinished():
+        counts = work.getCounts()
+        logger.logDebugMsg("DEBUG: Work Queue: %s", counts)
+        if len(processes) > 0 and all(process.poll() is not None for process in processes):
+            # A worker only stops on its own once the queue is finished, so they must have died
+            logger.logMsg("ERROR: Every local worker has stopped with channels still left to check!")
+            break
+        time.sleep(5)
+    for process in processes:
+        exit_code = process.wait()
+        if exit_code != 0:
+            logger.logMsg("ERROR: Worker process %s stopped with exit code %s!", process.pid, exit_code)
+    counts = work.getCounts()
+    logger.logMsg("The workers are finished! Done: %s :: Failed: %s", counts.get(work.DONE, 0), counts.get(work.FAILED, 0))
+
+def main():
 
     # Let's pull in an argument parser which will allow us to decide
     # how this program is going to be executed. this flow will offer several
     # different options, but only the modifications to the config.json file
-    # will alter the full execution of the program
+    # will alter the full execution of the program. The arguments are parsed
+    # before anything else is set up so that --help and the config actions
+    # don't have to wait for the API key, the databases or the network libraries
     parser = argparse.ArgumentParser()
-    parser.add_argument("--config", help="specify the actions list, add, update, or delete to modify the local config file")
+    parser.add_argument("--config", help="specify the actions list, add, update, or delete to modify the configured channels, or import to copy the channels in config.json into the channel database again after editing it by hand")
     parser.add_argument("--download-path", help="specify an alternative download path for any downloadable YouTube videos, please specify the full path")
+    parser.add_argument("--max-workers", type=int, help="specify how many YouTube API requests can be made at the same time, defaults to 8")
+    parser.add_argument("--max-downloads", type=int, help="specify how many videos can be downloaded at the same time, defaults to 2")
+    parser.add_argument("--daily-quota", type=int, help="specify the daily YouTube API quota for your project, defaults to 10000")
+    parser.add_argument("--discovery", choices=["api", "rss"], help="specify how to find new videos, either through the YouTube API (api) or through each channel's public feed which costs no API quota (rss), defaults to api")
+    parser.add_argument("--concurrent-fragments", type=int, help="specify how many fragments of a single video yt-dlp downloads at the same time, which speeds up large videos in fragmented formats, defaults to 1")
+    parser.add_argument("--min-free-space", help="specify how much space to always leave free in the download path, such as 500M or 20G, a download that would go over it is put off until there is room")
+    parser.add_argument("--limit-rate", help="specify how much bandwidth all of the downloads together can use per second, such as 500K or 10M, it is split evenly between the --max-downloads download slots, so each download gets a fixed share even when it runs on its own")
+    parser.add_argument("--engine", choices=["subprocess", "embedded"], help="specify how videos are downloaded, either by running the yt-dlp program for each video (subprocess) or through the yt-dlp Python package in a pool of long lived worker processes (embedded), defaults to subprocess")
+    parser.add_argument("--backfill", nargs="*", metavar="CHANNEL", help="go through the whole upload history of the given channels (or every channel if none are given) and download every video that matches, instead of only the new ones, picking up where the last backfill stopped")
+    parser.add_argument("--coordinator", type=int, metavar="WORKERS", help="share the channels out between the given number of worker processes on this machine, plus any started with --worker elsewhere against the same data directory, and wait for them to finish")
+    parser.add_argument("--worker", action="store_true", help="check the channels a coordinator has queued up, a few at a time, until there are none left")
+    parser.add_argument("--daemon", action="store_true", help="keep running and check each channel for new videos as often as it usually uploads, instead of checking every channel once and exiting")
+    parser.add_argument("--log-format", choices=["text", "json"], help="specify how log messages are written to youtubeDL.log, either as plain text (text) or as one JSON object per line (json), defaults to text")
+    parser.add_argument("--metrics-dir", help="specify a directory to write run metrics to, in the Prometheus textfile collector format (youtubeDL.prom) and as a JSON summary (youtubeDL.json), please specify the full path")
+    parser.add_argument("--quota-report", action="store_true", help="show how much of today's YouTube API quota has been spent and what the next run is projected to spend")
     args = parser.parse_args()
+
+    # Instantiate the first class
+    # This gives us access to the logging class
+    logger = youtubeLogger()
+    start = time.monotonic()
+
+    logger.logMsg("Starting script...")
     change_config = args.config
     change_download_path = args.download_path
+    change_max_workers = args.max_workers
+    change_max_downloads = args.max_downloads
+    change_concurrent_fragments = args.concurrent_fragments
+    change_daily_quota = args.daily_quota
+    change_metrics_dir = args.metrics_dir
 
+    if args.log_format is not None:
+        logger.setFormat(args.log_format)
+
+    # The config actions only need the channel database, so they're handled before
+    # the youtubeDL class (and everything it needs to talk to YouTube) is set up
     if change_config is not None:
+        channels = youtubeChannels()
         if change_config == "list":
-            print(ytDL.video_data)
+            print({"channels": channels.load()})
             exit(0)
         elif change_config == "add":
-            result = addConfig(ytDL.video_data)
+            result = addConfig(channels)
             if result is False:
                 print("ERROR: Unable to update config!")
                 exit(1)
             else:
-                ytDL.updateConfig()
                 print("Successfully updated the config!")
                 exit(0)
         elif change_config == "update":
-            result = updateConfig(ytDL.video_data)
+            result = updateConfig(channels)
             if result is False:
                 print("ERROR: Unable to update config!")
                 exit(1)
             else:
-                ytDL.updateConfig()
                 print("Successfully updated the config!")
                 exit(0)
         elif change_config == "delete":
-            result = deleteConfig(ytDL.video_data)
+            result = deleteConfig(channels)
             if result is False:
                 print("ERROR: Unable to update config!")
                 exit(1)
             else:
-                ytDL.updateConfig()
                 print("Successfully updated the config!")
                 exit(0)
+        elif change_config == "import":
+            try:
+                count = channels.importConfig()
+            except (OSError, ValueError, KeyError) as e:
+                print(f"ERROR: Unable to import the config.json file: {e}")
+                exit(1)
+            print(f"Successfully imported {count} channels from the config.json file!")
+            exit(0)
         else:
             print("error, unknown config action")
             exit(1)
 
+    from youtubeDL import youtubeDL
+    from youtubeOauth import youtubeOauth
+    from youtubePipeline import youtubePipeline
+    from youtubeEngine import youtubeEngine
+    from youtubeAdmission import youtubeAdmission
+    ytDL = youtubeDL()
+
     if change_download_path is not None:
         result = testPath(os.path.join(change_download_path, ""))
         if result is False:
@@ -125,14 +285,123 @@ def main():
             exit(1)
         else:
             ytDL.download_path = os.path.join(change_download_path, "")
-            logger.logMsg(f"Successfully changed the video download path to: {ytDL.download_path}")
+            logger.logMsg("Successfully changed the video download path to: %s", ytDL.download_path)
+
+    if change_max_workers is not None:
+        if change_max_workers < 1:
+            logger.logMsg("ERROR: The number of workers must be at least 1!")
+            exit(1)
+        else:
+            ytDL.max_workers = change_max_workers
+            logger.logMsg("Successfully changed the number of workers to: %s", ytDL.max_workers)
+
+    if change_max_downloads is not None:
+        if change_max_downloads < 1:
+            logger.logMsg("ERROR: The number of downloads must be at least 1!")
+            exit(1)
+        else:
+            ytDL.max_downloads = change_max_downloads
+            logger.logMsg("Successfully changed the number of downloads to: %s", ytDL.max_downloads)
+
+    if change_concurrent_fragments is not None:
+        if change_concurrent_fragments < 1:
+            logger.logMsg("ERROR: The number of concurrent fragments must be at least 1!")
+            exit(1)
+        else:
+            ytDL.concurrent_fragments = change_concurrent_fragments
+            logger.logMsg("Successfully changed the number of concurrent fragments to: %s", ytDL.concurrent_fragments)
+
+    if args.min_free_space is not None:
+        try:
+            ytDL._admission.min_free_space = youtubeAdmission.parseSize(args.min_free_space)
+        except ValueError:
+            logger.logMsg("ERROR: The minimum free space must be a size such as 500M or 20G!")
+            exit(1)
+        logger.logMsg("Successfully changed the minimum free space to: %s bytes", ytDL._admission.min_free_space)
+
+    if args.limit_rate is not None:
+        try:
+            ytDL._admission.limit_rate = youtubeAdmission.parseSize(args.limit_rate)
+        except ValueError:
+            logger.logMsg("ERROR: The rate limit must be a size such as 500K or 10M!")
+            exit(1)
+        logger.logMsg("Successfully changed the download rate limit to: %s bytes per second", ytDL._admission.limit_rate)
+
+    if change_daily_quota is not None:
+        if change_daily_quota < 1:
+            logger.logMsg("ERROR: The daily quota must be at least 1!")
+            exit(1)
+        else:
+            ytDL._quota.daily_quota = change_daily_quota
+            logger.logMsg("Successfully changed the daily quota to: %s", ytDL._quota.daily_quota)
+
+    if args.discovery is not None:
+        ytDL.discovery = args.discovery
+        logger.logMsg("Successfully changed the discovery method to: %s", ytDL.discovery)
+
+    if args.engine is not None:
+        if args.engine == "embedded" and not youtubeEngine.isAvailable():
+            logger.logMsg("ERROR: The yt-dlp Python package is not installed! Install it with pip or use the subprocess engine...")
+            exit(1)
+        else:
+            ytDL.engine = args.engine
+            logger.logMsg("Successfully changed the download engine to: %s", ytDL.engine)
+
+    backfill_channels = None
+    if args.backfill is not None:
+        backfill_channels = args.backfill
+        if len(backfill_channels) == 0:
+            backfill_channels = list(ytDL.video_data["channels"].keys())
+        unknown = [i for i in backfill_channels if i not in ytDL.video_data["channels"]]
+        if len(unknown) > 0:
+            logger.logMsg("ERROR: Unable to backfill channels that are not configured: %s!", ", ".join(unknown))
+            exit(1)
+        elif ytDL.discovery == "rss":
+            logger.logMsg("ERROR: The channel feeds only have the most recent uploads, so a backfill has to use the api discovery method!")
+            exit(1)
+        else:
+            logger.logMsg("Successfully turned on backfill for %s channels!", len(backfill_channels))
+
+    if args.coordinator is not None or args.worker:
+        if args.coordinator is not None and args.worker:
+            logger.logMsg("ERROR: The script can be a coordinator or a worker, not both!")
+            exit(1)
+        elif args.coordinator is not None and args.coordinator < 0:
+            logger.logMsg("ERROR: The number of workers must be at least 0!")
+            exit(1)
+        elif args.daemon or backfill_channels is not None:
+            logger.logMsg("ERROR: Coordinator and worker mode can't be used with daemon mode or a backfill!")
+            exit(1)
+        elif args.coordinator is not None:
+            logger.logMsg("Successfully turned on coordinator mode with %s local workers!", args.coordinator)
+        else:
+            logger.logMsg("Successfully turned on worker mode!")
+
+    metrics_path = None
+    if change_metrics_dir is not None:
+        result = testPath(change_metrics_dir)
+        if result is False:
+            logger.logMsg("ERROR: Unable to find or open the provided metrics path!")
+            exit(1)
+        else:
+            metrics_path = change_metrics_dir
+            youtubeMetrics().enable()
+            logger.logMsg("Successfully turned on metrics, which will be written to: %s", metrics_path)
+
+    if args.quota_report:
+        ytDL.setup()
+        ytDL._quota.logReport()
+        projected = ytDL.projectSpend()
+        print(f"Quota spent today: {ytDL._quota.getSpent()}")
+        print(f"Quota remaining today: {ytDL._quota.getRemaining()} of {ytDL._quota.daily_quota}")
+        print(f"Projected spend for the next run: {projected}")
+        exit(0)
 
     # Before we ge started on checking for videos
     # and downloading them, we need to be able to "like"
     # each video that we download, to do that we will need
     # an OAuth access token
     yto = youtubeOauth()
-    logger.logMsg("Attempting to refresh the access token...")
     if yto.NEW_AUTH:
         logger.logMsg("Access token was not refreshed, so we need to get a new one...")
         
@@ -163,8 +432,8 @@ def main():
             logger.logMsg("ERROR: Unable to set up Oauth authorization for this app! Cannot continue!")
             exit(1)
     else:
-        refresh = yto.refreshAccessToken()
-        if refresh is False:
+        # The access token from the last run is reused until it is about to expire
+        if yto.getAccessToken() is None:
             exit(1)
 
     # Now that we've finished refreshing our Access Token, we need to work on parsing
@@ -176,44 +445,68 @@ def main():
     # then we neeed to start getting those channelIds and saving them for later use
     ytDL.setup()
 
+    # Some API calls cost a lot more quota than others, so let's see where we stand before we start.
+    # Searches and ratings will be put off until tomorrow if there isn't enough left for them
+    ytDL._quota.logReport()
+    ytDL.projectSpend()
+
     if len(ytDL.search_queue) > 0:
         logger.logMsg("Starting up the search queries for the missing Channel IDs...")
         ytDL.getChannelIds()
-        logger.logMsg("Updating the local config file for future iterations...")
-        ytDL.updateConfig()
     else:
         logger.logMsg("No search queries needed as we have all Channel IDs saved!")
 
-    # And now that we have the channel's ID, we can get the channel's uploads playlist ID
-    ytDL.requestChannelPlaylistId()
-
-    # If the above went well, then we've updated the ytDL.video_data dictionary with the
-    # channel's "uploads" playlistId. This playlist holds all of the uploaded videos for that channel
-    # regardless of how the video was made or uploaded (live stream, or prerecorded, or shorts). Now
-    # we need to retrieve a recent list of videos in this playlist for each channel
-    ytDL.getRecentVideos()
-
-    # Once this is done, the ytDL.video_data dictionary will once again be updated with all
-    # of the most recent videos for each channel. Now we need to parse each video's publishedAt
-    # date & time + the video's title to see if it is a "new release" and if it matches the configured
-    # "titles" portion of the config.json file
-    ytDL.parseVideos()
-
-    # If we found any matching videos, then the ytDL.download_queue list will be populated with each
-    # of the videoIds that need to be downloaded. So let's check the length of that list. If the length
-    # of the list is greater than 0, then we have work to do. Otherwise, we can safely end the script here
-    queue = len(ytDL.download_queue)
-    if queue > 0:
-        if queue > 1:
-            grammar = f"There are {queue} videos"
-        else:
-            grammar = f"There is {queue} video"
-        logger.logMsg(f"{grammar} to download! Starting the download process now...")
-        ytDL.downloadVideos()
-        ytDL.rateVideos(yto._access_token)
-    else:
-        logger.logMsg("There are no videos in the download queue!")
+    # A backfill goes through the whole upload history of each channel once, page by page, and then exits
+    if backfill_channels is not None:
+        pipeline = youtubePipeline(ytDL, yto)
+        pipeline.run(backfill_channels, backfill=True)
+        ytDL._quota.logReport()
+        exportMetrics(metrics_path, logger, start)
+        logger.logMsg("Script is finished! Bye bye!")
+        exit(0)
+
+    # In worker mode we only check the channels we lease from the coordinator's queue
+    if args.worker:
+        runWorker(ytDL, yto, logger)
+        ytDL._quota.logReport()
+        exit(0)
+
+    # In coordinator mode the workers check the channels, and then we pick up anything
+    # that was left over, from this run or a previous one, on our own
+    if args.coordinator is not None:
+        runCoordinator(ytDL, logger, args.coordinator)
+        ytDL.reset()
+        pipeline = youtubePipeline(ytDL, yto)
+        pipeline.run([])
+        ytDL._quota.logReport()
+        exportMetrics(metrics_path, logger, start)
+        logger.logMsg("Script is finished! Bye bye!")
+        exit(0)
+
+    # In daemon mode we stay running and the scheduler decides when each channel gets checked
+    if args.daemon:
+        runDaemon(ytDL, yto, logger, metrics_path)
+        ytDL._quota.logReport()
+        exit(0)
+
+    # Now we run everything else as a pipeline, where each step hands its results to the next one
+    # as soon as they're ready instead of waiting for every channel to finish:
+    #   1. Get each channel's "uploads" playlistId (only if we don't have it saved yet). This playlist
+    #      holds all of the uploaded videos for that channel regardless of how the video was made or
+    #      uploaded (live stream, or prerecorded, or shorts)
+    #   2. Retrieve a recent list of videos in this playlist for each channel
+    #   3. Parse each video's publishedAt date & time + the video's title to see if it is a "new release"
+    #      and if it matches the configured "titles" portion of the config.json file
+    #   4. Look up each matching video's length, live status, availability and quality and check them against
+    #      the channel's download rules, so live streams, premieres and shorts aren't handed off to yt-dlp
+    #   5. Download each video that passes
+    #   6. Leave a like on each downloaded video
+    # Anything that was left half done by a previous run is picked up again at the step it stopped at
+    pipeline = youtubePipeline(ytDL, yto)
+    pipeline.run()
 
+    ytDL._quota.logReport()
+    exportMetrics(metrics_path, logger, start)
     logger.logMsg("Script is finished! Bye bye!")
 
 if __name__ == "__main__":
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# Checks that youtubeFeed reads the videos out of a channel's Atom feed, using small fixture feeds
+# served by a local stand-in for the channel feeds, which youtubeFeed is pointed at with YOUTUBEDL_FEED_URL
+#   python3 -m unittest discover tests
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+import os, sys, tempfile, threading, time, unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.realpath(__file__))))
+
+FEED = """<?xml version="1.0" encoding="UTF-8"?>
+<feed xmlns:yt="http://www.youtube.com/xml/schemas/2015" xmlns:media="http://search.yahoo.com/mrss/" xmlns="http://www.w3.org/2005/Atom">
+ <title>Fixture Channel</title>
+ <yt:channelId>UCfixture</yt:channelId>
+{entries}</feed>
+"""
+
+ENTRY = """ <entry>
+  <id>yt:video:{videoId}</id>
+  <yt:videoId>{videoId}</yt:videoId>
+  <title>{title}</title>
+  <published>{published}</published>
+ </entry>
+"""
+
+# These are the feeds served for each channel_id, anything else gets an HTTP 404
+FEEDS = {
+    "UCnormal": FEED.format(entries=
+        ENTRY.format(videoId="aaaaaaaaaaa", title="First &amp; Best", published="2026-10-17T12:00:00+00:00") +
+        ENTRY.format(videoId="bbbbbbbbbbb", title="Second", published="2026-10-16T12:00:00+00:00")
+    ),
+    "UCempty": FEED.format(entries=""),
+    "UCmalformed": FEED.format(entries=
+        " <entry>\n  <title>No Video ID</title>\n  <published>2026-10-17T12:00:00+00:00</published>\n </entry>\n" +
+        " <entry>\n  <yt:videoId>ccccccccccc</yt:videoId>\n  <title>No Published Date</title>\n </entry>\n" +
+        " <entry>\n  <yt:videoId>ddddddddddd</yt:videoId>\n  <published>2026-10-15T12:00:00+00:00</published>\n </entry>\n" +
+        ENTRY.format(videoId="eeeeeeeeeee", title="Fine", published="2026-10-14T12:00:00+00:00")
+    )
+}
+
+class fixtureFeedHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    paths = [] # This remembers the path of every request, so the tests can check what was asked for
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        parts = urlsplit(self.path)
+        channelId = parse_qs(parts.query).get("channel_id", [""])[0]
+        if parts.path != "/feeds/videos.xml" or channelId not in FEEDS:
+            self.send_response(404)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        data = FEEDS[channelId].encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/atom+xml")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        # The feed goes out a few bytes at a time, so the parser has to put the entries back together as they arrive
+        for i in range(0, len(data), 64):
+            self.wfile.write(data[i:i + 64])
+            self.wfile.flush()
+            time.sleep(0.001)
+
+class youtubeFeedTest(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        # Port 0 lets the operating system pick a free port, which is read back from server.server_address
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), fixtureFeedHandler)
+        cls.server.daemon_threads = True
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        # Both of these are read when the modules are imported, so they are set first, which also keeps the log out of the repo
+        cls.data_dir = tempfile.TemporaryDirectory()
+        cls.environ = {key: os.environ.get(key) for key in ("YOUTUBEDL_DATA_DIR", "YOUTUBEDL_FEED_URL")}
+        os.environ["YOUTUBEDL_DATA_DIR"] = cls.data_dir.name
+        os.environ["YOUTUBEDL_FEED_URL"] = f"http://127.0.0.1:{cls.server.server_address[1]}"
+        from youtubeFeed import youtubeFeed
+        from youtubeHttp import youtubeHttp
+        cls.youtubeFeed = youtubeFeed
+        cls.http = youtubeHttp()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.server.shutdown()
+        cls.server.server_close()
+        for key, value in cls.environ.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+        cls.data_dir.cleanup()
+
+    def setUp(self):
+        fixtureFeedHandler.paths = []
+
+    def getVideos(self, channelId):
+        videos = self.youtubeFeed(self.http).getVideos(channelId)
+        self.assertEqual(fixtureFeedHandler.paths, [f"/feeds/videos.xml?channel_id={channelId}"])
+        return videos
+
+    def testFeed(self):
+        self.assertEqual(self.getVideos("UCnormal"), {
+            "aaaaaaaaaaa": {"title": "First & Best", "publishedAt": "2026-10-17T12:00:00+00:00"},
+            "bbbbbbbbbbb": {"title": "Second", "publishedAt": "2026-10-16T12:00:00+00:00"}
+        })
+
+    def testEmptyFeed(self):
+        self.assertEqual(self.getVideos("UCempty"), {})
+
+    def testMalformedEntry(self):
+        # Entries without a videoId or a published date are skipped, and one without a title still counts
+        self.assertEqual(self.getVideos("UCmalformed"), {
+            "ddddddddddd": {"title": "", "publishedAt": "2026-10-15T12:00:00+00:00"},
+            "eeeeeeeeeee": {"title": "Fine", "publishedAt": "2026-10-14T12:00:00+00:00"}
+        })
+
+    def testHttpError(self):
+        with self.assertRaises(RuntimeError):
+            self.getVideos("UCmissing")
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,90 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+import shutil, threading
+
+class youtubeAdmission():
+    'This class serves to support the youtubeDL class by only letting a download start once there is room for it on the disk, and by sharing a bandwidth budget between the downloads that run at the same time'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _UNITS = {"K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+    _UNKNOWN_SIZE = 1024 ** 3 # This is how much room we set aside for a video when yt-dlp can't tell us how big it is
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    min_free_space = None # No download is started if it would leave less than this many bytes free in the download path, None turns this off
+    limit_rate = None # This is how many bytes per second all of the downloads together are allowed to use, None turns this off
+
+    def __init__(self):
+        self._condition = threading.Condition() # The downloads are admitted and released from worker threads
+        self._reserved = {} # This maps each running download to the room we set aside for it
+
+    @classmethod
+    def parseSize(cls, text):
+        'This method turns a size like 500M or 10G (or a plain number of bytes) into a number of bytes, or raises a ValueError if it is not a size'
+        text = text.strip().upper().rstrip("B")
+        if text[-1:] in cls._UNITS:
+            return int(float(text[:-1]) * cls._UNITS[text[-1]])
+        return int(text)
+
+    @staticmethod
+    def getInfoSize(info):
+        'This method works out how many bytes a video will take up from the info yt-dlp gives us about the formats it picked, or returns None if yt-dlp does not know'
+        # When the video and audio are downloaded separately and merged, each of them is listed in requested_formats
+        formats = info.get("requested_formats") or [info]
+        sizes = [f.get("filesize") or f.get("filesize_approx") for f in formats]
+        if None in sizes or 0 in sizes:
+            return None
+        return sum(sizes)
+
+    def isEnabled(self):
+        'This method runs a test to see if the free space check is turned on, which is the only thing we need size estimates for'
+        return self.min_free_space is not None
+
+    def getRateLimit(self, workers):
+        'This method returns the fixed cap on how many bytes per second each download can use, which is limit_rate split evenly between the given number of download slots so that together they never go over it, or None if there is no limit'
+        if self.limit_rate is None:
+            return None
+        # yt-dlp's limit can't be changed once a download has started, so a download running on its own
+        # still only gets its slot's share rather than the whole budget
+        return max(self.limit_rate // workers, 1)
+
+    def admit(self, videoId, path, estimate):
+        'This method waits until there is enough room in the given path to download the given video without going under min_free_space, sets that room aside and returns True, or returns False if the video will never fit'
+        if estimate is None:
+            estimate = self._UNKNOWN_SIZE
+        with self._condition:
+            while True:
+                # The running downloads haven't finished writing yet, so the room set aside for them is not free either
+                free = shutil.disk_usage(path).free - sum(self._reserved.values())
+                if free - estimate >= self.min_free_space:
+                    self._reserved[videoId] = estimate
+                    return True
+                if len(self._reserved) == 0:
+                    self._logger.logDebugMsg("DEBUG: Video ID: %s :: Estimated Size: %s :: Free Space: %s :: Minimum Free Space: %s", videoId, estimate, free, self.min_free_space)
+                    return False
+                # Something else is still downloading, so wait for it to finish and check again
+                self._condition.wait()
+
+    def release(self, videoId):
+        'This method gives back the room set aside for the given video once it has finished downloading, whether it worked or not'
+        with self._condition:
+            self._reserved.pop(videoId, None)
+            self._condition.notify_all()
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from datetime import datetime
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+import sqlite3, os, threading
+
+class youtubeCache():
+    'This class serves to support the youtubeDL class by keeping an on-disk copy of the ETag and body of every YouTube API response so that unchanged responses can be skipped with a conditional request'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _PRIVATE_PARAMS = ["key"] # These query parameters are never saved to disk or used to tell responses apart
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    hits = 0 # This counts how many requests came back as 304 Not Modified during this run
+    misses = 0 # This counts how many requests came back with a new body during this run
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The API requests are made from worker threads
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS responses (url TEXT PRIMARY KEY, etag TEXT NOT NULL, body TEXT NOT NULL, updatedAt TEXT NOT NULL)")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the cache database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getKey(self, url):
+        'This method strips the API Key (and anything else in _PRIVATE_PARAMS) out of the URL so it can be safely used as the cache key'
+        parts = urlsplit(url)
+        query = [(k, v) for k, v in parse_qsl(parts.query, keep_blank_values=True) if k not in self._PRIVATE_PARAMS]
+        return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ""))
+
+    def getHeaders(self, url):
+        'This method returns the conditional request headers to send for the given URL, which is empty if we have never cached it'
+        with self._lock:
+            row = self._db.execute("SELECT etag FROM responses WHERE url = ?", (self._getKey(url),)).fetchone()
+        if row is None:
+            return {}
+        return {"If-None-Match": row[0]}
+
+    def getBody(self, url):
+        'This method returns the cached body for the given URL or None if we have never cached it'
+        with self._lock:
+            row = self._db.execute("SELECT body FROM responses WHERE url = ?", (self._getKey(url),)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def recordHit(self):
+        'This method counts a request that came back as 304 Not Modified'
+        with self._lock:
+            self.hits += 1
+
+    def recordMiss(self):
+        'This method counts a request that came back with a new body'
+        with self._lock:
+            self.misses += 1
+
+    def save(self, url, etag, body):
+        'This method saves the ETag and body of a successful response for the given URL'
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO responses (url, etag, body, updatedAt) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (url) DO UPDATE SET etag = excluded.etag, body = excluded.body, updatedAt = excluded.updatedAt",
+                (self._getKey(url), etag, body, datetime.now().strftime("%Y-%m-%dT%H:%M:%S"))
+            )
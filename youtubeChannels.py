@@ -0,0 +1,146 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from datetime import datetime
+import sqlite3, json, os, threading
+
+class youtubeChannels():
+    'This class serves to support the youtubeDL class by keeping the configured channels in an indexed on-disk store, so that adding, changing or looking up one channel never means rewriting the whole config'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _CONFIG_FILE = _PATH + "/config.json"
+    _IDS = ("channelId", "playlistId") # These get their own columns so channels can be looked up by them
+    _TRANSIENT = ("videos",) # These keys only live for a single run and are never saved
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The resolve stage saves new IDs from a worker thread
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                # config holds everything else about the channel (titles, exclude, ignoreCase and so on) as JSON
+                self._db.execute("CREATE TABLE IF NOT EXISTS channels (name TEXT PRIMARY KEY, channelId TEXT, playlistId TEXT, config TEXT NOT NULL, updatedAt TEXT NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS channels_channelId ON channels (channelId)")
+                self._db.execute("CREATE TABLE IF NOT EXISTS imports (path TEXT PRIMARY KEY, importedAt TEXT NOT NULL)")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the channel database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getCurrentTime(self):
+        'This method gets the current time in the same format the youtubeDL class uses'
+        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+    def _toRow(self, name, config):
+        'This method splits a channel\'s config into the values for a row in the channels table'
+        rest = {k: v for k, v in config.items() if k not in self._IDS and k not in self._TRANSIENT}
+        return (name, config.get("channelId"), config.get("playlistId"), json.dumps(rest), self._getCurrentTime())
+
+    def _fromRow(self, row):
+        'This method puts a row from the channels table back together into a channel\'s config'
+        config = json.loads(row[3])
+        if row[1] is not None:
+            config["channelId"] = row[1]
+        if row[2] is not None:
+            config["playlistId"] = row[2]
+        return config
+
+    def isImported(self, path):
+        'This method runs a test to see if the given config file has ever been imported'
+        with self._lock:
+            row = self._db.execute("SELECT importedAt FROM imports WHERE path = ?", (path,)).fetchone()
+        return row is not None
+
+    def importConfig(self, path=None):
+        'This method copies every channel in the given config.json file (or the one next to the database) into the store in a single transaction, returning how many channels were imported'
+        if path is None:
+            path = self._CONFIG_FILE
+        with open(path, "r") as file:
+            channels = json.load(file)["channels"]
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO channels (name, channelId, playlistId, config, updatedAt) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET channelId = COALESCE(excluded.channelId, channelId), playlistId = COALESCE(excluded.playlistId, playlistId), "
+                "config = excluded.config, updatedAt = excluded.updatedAt",
+                [self._toRow(name, channels[name]) for name in channels]
+            )
+            self._db.execute("INSERT INTO imports (path, importedAt) VALUES (?, ?) ON CONFLICT (path) DO UPDATE SET importedAt = excluded.importedAt", (path, self._getCurrentTime()))
+        return len(channels)
+
+    def load(self):
+        'This method returns every channel in the store as {name: config}, copying the channels in config.json into the store first if this is the first time we have run'
+        # config.json is only read the first time we run, after that the store is where the channels live
+        if not self.isImported(self._CONFIG_FILE):
+            try:
+                count = self.importConfig()
+                self._logger.logMsg("Successfully imported %s channels from the config.json file!", count)
+            except FileNotFoundError as e:
+                self._logger.logMsg("ERROR: Unable to locate or open the config.json file! Cannot continue!")
+                self._logger.logMsg("You either need to create a config.json file and paste in the template from GitHub or move the comfig.json file you created into the same directory as this script...")
+                exit(1)
+            except (ValueError, KeyError) as e:
+                self._logger.logMsg("ERROR: Unable to read the channels from the config.json file! Cannot continue!")
+                self._logger.logDebugMsg("DEBUG: Config File: %s :: Exception Text: %s", self._CONFIG_FILE, e)
+                exit(1)
+        return self.getChannels()
+
+    def getChannels(self):
+        'This method returns every channel in the store as {name: config}, in the order they were added'
+        with self._lock:
+            rows = self._db.execute("SELECT name, channelId, playlistId, config FROM channels ORDER BY rowid").fetchall()
+        return {row[0]: self._fromRow(row) for row in rows}
+
+    def getChannel(self, name):
+        'This method returns the config of the given channel or None if there is no such channel'
+        with self._lock:
+            row = self._db.execute("SELECT name, channelId, playlistId, config FROM channels WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return self._fromRow(row)
+
+    def saveChannel(self, name, config):
+        'This method adds the given channel to the store or replaces its config if it is already there'
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO channels (name, channelId, playlistId, config, updatedAt) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET channelId = excluded.channelId, playlistId = excluded.playlistId, config = excluded.config, updatedAt = excluded.updatedAt",
+                self._toRow(name, config)
+            )
+
+    def setIds(self, name, channelId=None, playlistId=None):
+        'This method saves the Channel ID and/or uploads Playlist ID we looked up for the given channel, leaving the rest of its config alone'
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE channels SET channelId = COALESCE(?, channelId), playlistId = COALESCE(?, playlistId), updatedAt = ? WHERE name = ?",
+                (channelId, playlistId, self._getCurrentTime(), name)
+            )
+
+    def deleteChannel(self, name):
+        'This method removes the given channel from the store and returns whether it was there to remove'
+        with self._lock, self._db:
+            cursor = self._db.execute("DELETE FROM channels WHERE name = ?", (name,))
+        return cursor.rowcount > 0
@@ -1,7 +1,22 @@
 #!/usr/bin/env python3
 from youtubeLogger import youtubeLogger
-from datetime import datetime, timezone
-import requests, json, pytz, os, subprocess
+from youtubeLedger import youtubeLedger
+from youtubeJournal import youtubeJournal
+from youtubeChannels import youtubeChannels
+from youtubeCache import youtubeCache
+from youtubeQuota import youtubeQuota
+from youtubeFeed import youtubeFeed
+from youtubeResolver import youtubeResolver
+from youtubeMatcher import youtubeMatcher
+from youtubeRules import youtubeRules
+from youtubeEngine import youtubeEngine
+from youtubeAdmission import youtubeAdmission
+from youtubeMetrics import youtubeMetrics
+from youtubeHttp import youtubeHttp
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
+import json, os, re, subprocess, threading, time
 
 class youtubeDL():
     'This class servers to parse a YouTube Content Creator uploads playlist for videos to download and if it meets the defined criteria will be handed off to yt-dlp to actually download the video'
@@ -15,52 +30,78 @@ class youtubeDL():
     #########################
     ### PRIVATE CONSTANTS ###
     #########################
-    _PATH = os.path.dirname(os.path.realpath(__file__))
-    _CONFIG_FILE = _PATH + "/config.json"
-    _CREDS_FILE = _PATH + "/.creds" # This file should store your API Key
-    _TIME = 3600 # This is used to control how far back in time we should check for "new releases" (if you set this to 3600, then you should only run this script once an hour)
-    _YTDLP = "/usr/local/bin/yt-dlp"
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is where config, credentials and the database live, which can be moved (for benchmarks or tests) with the YOUTUBEDL_DATA_DIR environment variable
+    _CREDS_FILE = _PATH + "/.creds" # This file should store your API Key, or one API Key per line to share the work (and the quota) between several Google Cloud projects
+    _TIME = 3600 # This is used to control how far back in time we should check for "new releases" the first time we poll a channel, after that the ledger remembers when we last checked (this is also used as a grace period for videos that show up in the uploads playlist late)
+    _YTDLP = os.environ.get("YOUTUBEDL_YTDLP", "/usr/local/bin/yt-dlp") # This can be pointed somewhere else with the YOUTUBEDL_YTDLP environment variable
+    _BATCH_SIZE = 50 # This is the maximum number of IDs the YouTube API will accept in a single "id" parameter
+    _RECENT_RESULTS = 5 # This is how many of the most recent uploads we ask for when polling a channel
+    _PAGE_SIZE = 50 # This is the most videos the YouTube API will return on one page of a playlist
+    _API_URL = urlsplit(os.environ.get("YOUTUBEDL_API_URL", "https://youtube.googleapis.com")) # This can be pointed at a stand-in server with the YOUTUBEDL_API_URL environment variable
 
     ########################
     ### PUBLIC CONSTANTS ###
     ########################
-    SCHEME = "https://"
-    BASE_URL = "youtube.googleapis.com"
+    SCHEME = _API_URL.scheme + "://"
+    BASE_URL = _API_URL.netloc
     VIDEO_FORMAT = "bv*[ext=webm]+ba[ext=m4a]/b[ext=webm]"
     VIDEO_NAME = "%(channel)s - %(title)s.%(ext)s"
 
     #######################
     ### PRIVATE OBJECTS ###
     #######################
-    _apikey = "" # This will be populated with the value that we read in from the _CREDS_FILE
-    _headers = {"Accept": "application/json"} # This will have the _apikey value added to it, which is why i want to keep it private
+    _apikeys = [] # This will be populated with the values that we read in from the _CREDS_FILE
+    _headers = {"Accept": "application/json"} # This will have one of the _apikeys added to it, which is why i want to keep it private
     _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+    _metrics = youtubeMetrics() # Bring in our metrics class so every API call, download and step of the run can be counted and timed
+    _matchers = {} # This will be populated with each channel's compiled title matcher the first time it is needed
+    _rules = {} # This will be populated with each channel's download rules the first time they are needed
+    _engine = None # This will be populated with the pool of yt-dlp worker processes if the embedded engine is used
+    _http = None # This is the HTTP client shared by all worker threads, which reuses connections, retries failed requests and stops calling an endpoint that keeps failing
 
     ######################
     ### PUBLIC OBJECTS ###
     ######################
     video_data = {}
-    download_queue = []
     search_queue = []
+    playlist_queue = []
+    failed_channels = {} # This will be populated with any channels we were unable to get recent videos for and why
     download_path = _PATH
+    max_workers = 8 # This controls how many API requests are allowed to be in flight at the same time
+    max_downloads = 2 # This controls how many yt-dlp downloads are allowed to run at the same time
+    concurrent_fragments = 1 # This controls how many fragments of a single video yt-dlp downloads at the same time, which only helps fragmented (DASH) formats
+    download_results = {} # This will be populated with the exit code, duration and bytes written for each downloaded video
+    discovery = "api" # This controls how we find recent uploads, either "api" (the playlistItems endpoint) or "rss" (the channel's public feed, which costs no quota)
+    engine = "subprocess" # This controls how videos are downloaded, either "subprocess" (running the yt-dlp program for each video) or "embedded" (the yt-dlp Python package in a pool of long lived worker processes)
 
     def __init__(self):
         try:
             with open(self._CREDS_FILE, "r") as file:
-                self._apikey = file.readlines()[0]
+                self._apikeys = [line.strip() for line in file.readlines() if line.strip() != ""]
         except FileNotFoundError as e:
             self._logger.logMsg("ERROR: Unable to locate or open the .creds file! Cannot continue!")
             self._logger.logMsg("You either need to create a .creds file and paste in your API Key or move the .creds file you created into the same directory as this script...")
             exit(1)
-
-        try:
-            with open(self._CONFIG_FILE, "r") as file:
-                self.video_data = json.loads(file.readlines()[0])
-        except FileNotFoundError as e:
-            self._logger.logMsg("ERROR: Unable to locate or open the config.json file! Cannot continue!")
-            self._logger.logMsg("You either need to create a config.json file and paste in the template from GitHub or move the comfig.json file you created into the same directory as this script...")
+        if len(self._apikeys) == 0:
+            self._logger.logMsg("ERROR: There is no API Key in the .creds file! Cannot continue!")
             exit(1)
 
+        # The channels live in the database so that one channel can be changed without rewriting the rest
+        self._channels = youtubeChannels()
+        self.video_data = {"channels": self._channels.load()}
+
+        self._matchers = {}
+        self._rules = {}
+        self._ledger = youtubeLedger()
+        self._journal = youtubeJournal()
+        self._admission = youtubeAdmission()
+        self._estimates = {} # This will be populated with the estimated size of each video we want to download
+        self._cache = youtubeCache()
+        self._quota = youtubeQuota()
+        self._quota.key_count = len(self._apikeys)
+        self._resolver = youtubeResolver(self)
+        self._http_lock = threading.Lock() # Every stage asks for the HTTP client from its own worker threads, and there must only ever be one so they share its circuits
+
     def _getCurrentTime(self):
         'This method gets the current time returned in the same format as the YouTube API time format'
         return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
@@ -71,198 +112,609 @@ class youtubeDL():
 
     def _convertToEst(self, timestamp):
         'This method is used to convert the UTC Timestamp returned from the YouTube API into an EST timestamp instead'
-        return datetime.fromisoformat(timestamp[:-1]).replace(tzinfo=timezone.utc).astimezone(pytz.timezone("America/New_York")).strftime("%Y-%m-%dT%H:%M:%S")
+        import pytz # This is imported the first time it is needed so that commands which never look at a video don't load it
+        # The API ends its timestamps with a "Z" while the channel feeds end theirs with "+00:00"
+        return datetime.fromisoformat(timestamp.replace("Z", "+00:00")).astimezone(pytz.timezone("America/New_York")).strftime("%Y-%m-%dT%H:%M:%S")
 
-    def _isNewRelease(self, currentTime, publishedTime):
-        'This method runs a test to see if the current time - the published time is less than the _TIME constant, indicating that it is a "NEW" video to download'
-        test = self._convertTime(currentTime).timestamp() - self._convertTime(publishedTime).timestamp()
+    def _isNewRelease(self, currentTime, publishedTime, lastPoll=None):
+        'This method runs a test to see if the video was published since the last time we polled its channel (or within the _TIME constant if we never have), indicating that it is a "NEW" video to download'
+        published = self._convertTime(publishedTime).timestamp()
+        if lastPoll is not None:
+            # We don't need to worry about picking up the same video twice here because
+            # the ledger already filters out everything we've seen before
+            test = self._convertTime(lastPoll).timestamp() - published
+        else:
+            test = self._convertTime(currentTime).timestamp() - published
         if test < self._TIME:
             return True
         else:
             return False
 
-    def _doesTitleMatch(self, titles, title):
-        'This method runs a test to see if the current video title matches any of the titles provided from config.json'
-        count = 0 # This variable is a counter to help us parse each video title and if no matches occur we error out
-        if len(titles) > 0:
-            for i in titles:
-                if i in title:
-                    # Stop here as we found a match and can safely download the video
-                    return True
-                else:
-                    # Increment the counter so that we test each title in the list
-                    count += 1
-            if count == len(titles):
-                # If all tests failed then we should not download the video
-                return False
-        else:
-            # If there are no titles provided to search, then we just download all new videos
-            return True
+    def _getMatcher(self, channel):
+        'This method returns the compiled title matcher for the given channel, compiling it from the titles, exclude, ignoreCase, regex and wholeWord keys in its config the first time it is needed, or None if the keywords are not valid'
+        if channel not in self._matchers:
+            config = self.video_data["channels"][channel]
+            try:
+                self._matchers[channel] = youtubeMatcher(config["titles"], config.get("exclude"), config.get("ignoreCase", False), config.get("regex", False), config.get("wholeWord", False))
+            except re.error as e:
+                self._logger.logMsg("ERROR: Unable to understand the title keywords for %s! Please check the config...", channel)
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Titles: %s :: Exclude: %s :: Exception Text: %s", channel, config['titles'], config.get('exclude'), e)
+                self._matchers[channel] = None
+        return self._matchers[channel]
 
-    def updateConfig(self):
-        'This method writes the self.video_data object back into the config.json file only if it has been changed'
-        try:
-            with open(self._CONFIG_FILE, "w") as file:
-                json.dump(self.video_data, file)
-            self._logger.logMsg("Successfully updated the local config!")
-        except BaseException as e:
-            self._logger.logMsg(f"ERROR: Unable to update {self._CONFIG_FILE} with new Channel IDs!")
-            self._logger.logDebugMsg(f"DEBUG: Exception Text: {e}")
-            exit(1)
+    def _getRules(self, channel):
+        'This method returns the download rules for the given channel, built from the minDuration, maxDuration, live, availability and definition keys in its config the first time they are needed, or None if the rules are not valid'
+        if channel not in self._rules:
+            # A video whose channel has since been removed from the config still gets the default rules
+            config = self.video_data["channels"].get(channel, {})
+            try:
+                self._rules[channel] = youtubeRules.fromConfig(config)
+            except (TypeError, ValueError) as e:
+                self._logger.logMsg("ERROR: Unable to understand the download rules for %s! Please check the config...", channel)
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Config: %s :: Exception Text: %s", channel, config, e)
+                self._rules[channel] = None
+        return self._rules[channel]
+
+    def _getHttp(self):
+        'This method returns the shared HTTP client, creating it the first time it is needed with a connection pool large enough for max_workers'
+        with self._http_lock:
+            if self._http is None:
+                self._http = youtubeHttp(self.max_workers, self._headers)
+            return self._http
+
+    def _getApiKey(self):
+        'This method returns the API Key to make the next call with, which is whichever key has the most quota left today when there is more than one'
+        if len(self._apikeys) == 1:
+            return self._apikeys[0]
+        return self._quota.pickKey(self._apikeys)
+
+    def _getUrlKey(self, url):
+        'This method returns the API Key the given URL is being called with, so the quota can be charged to it'
+        return parse_qs(urlsplit(url).query).get("key", [None])[0]
+
+    def _getEndpoint(self, url):
+        'This method returns the name of the YouTube API endpoint being called by the given URL, such as "search" or "videos/rate", for quota accounting'
+        return youtubeHttp.getEndpoint(url)
+
+    def _getPollingReserve(self):
+        'This method returns how many quota units we need to keep back so that we can still poll every channel once, which is the cheapest and most important thing we do'
+        polls = len([i for i in self.video_data["channels"] if "playlistId" in self.video_data["channels"][i].keys()])
+        if self.discovery == "rss":
+            polls = 0 # The channel feeds don't cost any quota
+        lookups = -(-len(self.playlist_queue) // self._BATCH_SIZE) # This rounds up without needing the math module
+        return self._quota.getCost("playlistItems", polls) + self._quota.getCost("channels", lookups)
+
+    def projectSpend(self):
+        'This method logs how many quota units this run is expected to spend against how many we have left for today, and returns the projected spend'
+        polls = len(self.video_data["channels"])
+        if self.discovery == "rss":
+            polls = 0 # The channel feeds don't cost any quota
+        cached = self._resolver.getCached(self.search_queue)
+        calls = {
+            # This is the worst case, where none of the cheaper lookups find the channel
+            "search": len([i for i in self.search_queue if i not in cached]),
+            "channels": -(-len(self.playlist_queue) // self._BATCH_SIZE),
+            "playlistItems": polls,
+            # We can't know how many new videos there will be, but we do know about anything left over from a previous run
+            "videos": -(-(len(self._ledger.getVideos(self._ledger.QUEUED)) + len(self._ledger.getVideos(self._ledger.WAITING))) // self._BATCH_SIZE),
+            "videos/rate": len(self._ledger.getVideos(self._ledger.QUEUED)) + len(self._ledger.getVideos(self._ledger.DOWNLOADED))
+        }
+        projected = self._quota.projectSpend(calls)
+        remaining = self._quota.getRemaining()
+        self._logger.logMsg("This run is projected to spend at least %s quota units and there are %s units remaining for today!", projected, remaining)
+        self._logger.logDebugMsg("DEBUG: Projected Calls: %s", calls)
+        if projected > remaining:
+            self._logger.logMsg("WARNING: The projected spend is more than the remaining quota! Searches and ratings will be put off until the quota resets...")
+        return projected
+
+    def _apiGet(self, url, cache=True):
+        'This method makes a conditional GET request to the YouTube API through the response cache, returning the HTTP status code, the response text and whether the response was unchanged since we last saw it, or raising a RuntimeError if there was no response. Responses we will never ask for again can leave the cache out'
+        # https://developers.google.com/youtube/v3/getting-started#etags
+        # Every attempt costs quota, including the ones that are retried
+        endpoint = self._getEndpoint(url)
+        key = self._getUrlKey(url)
+        spend = lambda: self._quota.spend(endpoint, key=key)
+        if not cache:
+            r = self._getHttp().get(url, endpoint, spend)
+            return r.status_code, r.text, False
+        r = self._getHttp().get(url, endpoint, spend, headers=self._cache.getHeaders(url))
+        if r.status_code == 304:
+            body = self._cache.getBody(url)
+            if body is not None:
+                self._cache.recordHit()
+                self._metrics.inc("api_cache_total", {"endpoint": endpoint, "result": "hit"})
+                return 200, body, True
+            # The cached copy disappeared out from under us, so ask again without the ETag
+            r = self._getHttp().get(url, endpoint, spend)
+        if r.status_code == 200:
+            self._cache.recordMiss()
+            self._metrics.inc("api_cache_total", {"endpoint": endpoint, "result": "miss"})
+            etag = r.headers.get("ETag")
+            if etag is not None:
+                self._cache.save(url, etag, r.text)
+        return r.status_code, r.text, False
 
     def setup(self):
-        'This method checks the config.json file to see if we have the Channel ID configured for each listed Channel'
+        'This method checks the channel database to see if we have the Channel ID and uploads Playlist ID configured for each listed Channel'
         for i in self.video_data["channels"]:
+            if "playlistId" not in self.video_data["channels"][i].keys():
+                # The uploads playlist never changes for a channel, so once
+                # we have it saved we never need to ask the API for it again
+                self.playlist_queue.append(i)
             if "channelId" in self.video_data["channels"][i].keys():
                 # There's nothing to do here because we already have
                 # the channelId in our config, again we're doing this
                 # to save on the quota
-                self._logger.logMsg(f"The Channel ID is already configured for {i}!")
+                self._logger.logMsg("The Channel ID is already configured for %s!", i)
             else:
                 # this means we need to get the channel id
                 # this is a VERY expensive api call so we should
                 # only do this if we have to. just populate a
                 # list of channels to search for
                 self.search_queue.append(i)
-                self._logger.logMsg(f"The Channel ID is not configured for {i}!")
+                self._logger.logMsg("The Channel ID is not configured for %s!", i)
                 self._logger.logMsg("Appending Channel to search queue...")
 
+    @youtubeMetrics.timed("getChannelIds")
     def getChannelIds(self):
-        'This method is used to search YouTube for the provided Channel Names and get their associated Channel ID'
-        # https://developers.google.com/youtube/v3/docs/search/list
-        to_remove = [] # This list will be populated only if we cannot find the channelId
+        'This method is used to find the Channel ID for every Channel Name in the search_queue through the resolver, which only searches YouTube when a cheaper lookup has not worked'
+        results = self._resolver.resolve(self.search_queue)
         for i in self.search_queue:
-            query = i # This is the "Search Term" to pass to the API
-            endpoint = f"/youtube/v3/search?part=snippet&maxResults=5&q={query}&key={self._apikey}"
-            url = self.SCHEME + self.BASE_URL + endpoint
-            self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-            r = requests.get(url=url, headers=self._headers)
-            json_data = json.loads(r.text)
-            if r.status_code == 200:
-                ii = 0
-                while ii < len(json_data["items"]):
-                    if json_data["items"][ii]["id"]["kind"] == "youtube#channel":
-                        channelId = json_data["items"][ii]["id"]["channelId"]
-                        self.video_data["channels"][i]["channelId"] = channelId
-                        self._logger.logMsg(f"Successfully found the YouTube Channel ID with the name: {query}!")
-                        self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Query: {query} :: Channel ID: {channelId} :: Response Text: {json_data}")
-                        break # no reason to keep parsing the list if we found what we needed
-                    else:
-                        ii += 1 # this is used as a "counter", we want to parse each result from the search to give every chance of finding the right channelId
-                if ii == len(json_data["items"]):
-                    self._logger.logMsg(f"ERROR: Unable to locate any YouTube Channels with the name: {query}!")
-                    self._logger.logMsg("Removing this channel name from the list of channels to work on...")
-                    to_remove.append(i)
-        if len(to_remove) > 0:
-            for i in to_remove:
+            if i not in results:
+                # The lookup was put off (or failed) this time, so the channel is skipped until the next run
+                continue
+            channelId = results[i]
+            if channelId is not None:
+                self.video_data["channels"][i]["channelId"] = channelId
+                self._channels.setIds(i, channelId=channelId)
+            else:
+                # The channel stays in the channel database, but the resolver won't look for it again for a while
+                self._logger.logMsg("ERROR: Unable to locate any YouTube Channels with the name: %s!", i)
+                self._logger.logMsg("Removing this channel name from the list of channels to work on...")
                 self.video_data["channels"].pop(i)
 
-    def requestChannelPlaylistId(self):
-        'This method is used to get the "Uploads" playlistId for each YouTube Channel listed in the config.json file'
+    @youtubeMetrics.timed("requestChannelPlaylistId")
+    def requestChannelPlaylistId(self, channels=None):
+        'This method is used to get the "Uploads" playlistId for each YouTube Channel in the playlist_queue (or the given list of channels), asking for up to _BATCH_SIZE channels per API call'
         # https://developers.google.com/youtube/v3/docs/channels/list#request
-        to_remove = []
-        for i in self.video_data["channels"]:
+        pending = {} # This maps each channelId back to the channel name(s) in our config
+        if channels is None:
+            channels = self.playlist_queue
+            self.playlist_queue = []
+        for i in channels:
+            if i not in self.video_data["channels"] or "channelId" not in self.video_data["channels"][i].keys():
+                # The channel was removed from the config because we could not find its channelId
+                # or the search for its channelId was put off to save quota
+                continue
             channelId = self.video_data["channels"][i]["channelId"]
-            endpoint = f"/youtube/v3/channels?part=contentDetails&id={channelId}&key={self._apikey}"
+            pending.setdefault(channelId, []).append(i)
+
+        channelIds = list(pending.keys())
+        for start in range(0, len(channelIds), self._BATCH_SIZE):
+            batch = channelIds[start:start + self._BATCH_SIZE]
+            endpoint = f"/youtube/v3/channels?part=contentDetails&maxResults={self._BATCH_SIZE}&id={','.join(batch)}&key={self._getApiKey()}"
             url = self.SCHEME + self.BASE_URL + endpoint
-            self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-            r = requests.get(url=url, headers=self._headers)
-            json_data = json.loads(r.text)
-            if r.status_code == 200:
-                playlistId = json_data["items"][0]["contentDetails"]["relatedPlaylists"]["uploads"]
-                self.video_data["channels"][i]["playlistId"] = playlistId
-                self._logger.logMsg(f"Successfully found the uploads Playlist ID for the Channel: {i}!")
-                self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Channel: {i} :: Channel ID: {channelId} :: Uploads Playlist ID: {playlistId} :: Response Text: {json_data}")
+            self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+            try:
+                status_code, text, unchanged = self._apiGet(url)
+            except RuntimeError as e:
+                status_code, text = None, str(e)
+            if status_code == 200:
+                for item in json.loads(text).get("items", []):
+                    playlistId = item["contentDetails"]["relatedPlaylists"]["uploads"]
+                    for i in pending.pop(item["id"], []):
+                        self.video_data["channels"][i]["playlistId"] = playlistId
+                        self._channels.setIds(i, playlistId=playlistId)
+                        self._logger.logMsg("Successfully found the uploads Playlist ID for the Channel: %s!", i)
+                        self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Channel: %s :: Channel ID: %s :: Uploads Playlist ID: %s", status_code, i, item['id'], playlistId)
             else:
-                self._logger.logMsg(f"ERROR: Unable to locate the uploads Playlist for: {i}!")
-                self._logger.logMsg("Removing this channel name from the list of channels to work on...")
-        if len(to_remove) > 0:
-            for i in to_remove:
-                self.video_data["channels"].pop(i)
+                self._logger.logMsg("ERROR: Unable to contact YouTube API or process request/response!")
+                self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Channel IDs: %s :: Response Text: %s", status_code, batch, text)
+                # Leave these channels in the config, they will be retried on the next run
+                for channelId in batch:
+                    pending.pop(channelId, None)
 
-    def getRecentVideos(self):
-        'This method is used to get the X most recent videos for the provided playlistIds where X defaults to 5'
+        # Anything still pending was not returned by the API at all, which usually means the channel is gone, but it can
+        # also be suspended for a while or left out of a bad response, so it stays in the channel database and is tried again next run
+        for channelId in pending:
+            for i in pending[channelId]:
+                self._logger.logMsg("ERROR: Unable to locate the uploads Playlist for: %s!", i)
+                self._logger.logMsg("Skipping this channel for this run...")
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Channel ID: %s", i, channelId)
+                self.video_data["channels"].pop(i, None)
+
+    def _fetchUploadsPage(self, playlistId, maxResults, pageToken=None, cache=True):
+        'This method gets one page of the given uploads playlist, returning the videos on it (or None if nothing has changed since the last run and they are all in the ledger already) and the pageToken of the next page (or None if this is the last page), or raising an exception on failure'
         # https://developers.google.com/youtube/v3/docs/playlistItems/list#request
-        for i in self.video_data["channels"]:
-            playlistId = self.video_data["channels"][i]["playlistId"]
-            endpoint = f"/youtube/v3/playlistItems?part=snippet&maxResults=5&playlistId={playlistId}&key={self._apikey}"
+        endpoint = f"/youtube/v3/playlistItems?part=snippet&maxResults={maxResults}&playlistId={playlistId}&key={self._getApiKey()}"
+        if pageToken is not None:
+            endpoint += f"&pageToken={pageToken}"
+        url = self.SCHEME + self.BASE_URL + endpoint
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+        status_code, text, unchanged = self._apiGet(url, cache)
+        if status_code != 200:
+            raise RuntimeError(f"HTTP Response Code: {status_code} :: Response Text: {text}")
+        json_data = json.loads(text)
+        videos = {}
+        for item in json_data["items"]:
+            publishedAt = self._convertToEst(item["snippet"]["publishedAt"])
+            resourceId = item["snippet"]["resourceId"]["videoId"]
+            title = item["snippet"]["title"]
+            videos[resourceId] = {"title": title, "publishedAt": publishedAt}
+        if unchanged and all(self._ledger.getState(video) is not None for video in videos):
+            # Nothing has been uploaded since the last time we asked, and every video on the page made it into the ledger, so there is nothing to filter.
+            # The ETag is saved as soon as the page arrives, so a video that never made it (because we crashed or the channel's config was broken) is filtered again
+            return None, None
+        return videos, json_data.get("nextPageToken")
+
+    def _fetchRecentVideos(self, channel, playlistId):
+        'This method is used by the pipeline\'s fetch stage (through getFetcher) to get the _RECENT_RESULTS most recent videos for a single playlistId, and more if they are all new, returning the videos found (or None if nothing has changed since the last run) or raising an exception on failure'
+        videos, pageToken = self._fetchUploadsPage(playlistId, self._RECENT_RESULTS)
+        if videos is None:
+            return None
+        # If every video on the page is new then a burst of uploads may have pushed some we haven't seen
+        # onto the next page, so keep going until we reach a video that we've seen or that isn't new
+        page = videos
+        lastPoll = self._ledger.getLastPoll(channel)
+        while pageToken is not None and len(page) > 0:
+            oldest = min(page, key=lambda video: page[video]["publishedAt"])
+            if self._ledger.getState(oldest) is not None or not self._isNewRelease(self._getCurrentTime(), page[oldest]["publishedAt"], lastPoll):
+                break
+            self._logger.logDebugMsg("DEBUG: Channel: %s :: Every video on the page is new, getting the next page...", channel)
+            page, pageToken = self._fetchUploadsPage(playlistId, self._PAGE_SIZE, pageToken, cache=False)
+            videos.update(page)
+        return videos
+
+    def iterUploads(self, channel, playlistId, pageToken=None):
+        'This method goes through the whole uploads playlist of the given channel one page of _PAGE_SIZE videos at a time, starting at the given pageToken, and yields the videos on each page along with the pageToken of the page after it (or None after the last page)'
+        # Only one page is held at a time, so a channel with thousands of uploads takes no more memory than one with fifty
+        while True:
+            if not self._quota.canAfford("playlistItems", reserve=self._getPollingReserve()):
+                self._logger.logMsg("WARNING: Not enough quota remaining to backfill %s! Will carry on from here once the quota resets...", channel)
+                return
+            # These pages are only ever asked for once, so there is no point keeping them in the response cache
+            videos, pageToken = self._fetchUploadsPage(playlistId, self._PAGE_SIZE, pageToken, cache=False)
+            yield videos, pageToken
+            if pageToken is None:
+                return
+
+    def _fetchFeedVideos(self, channel, channelId):
+        'This method is used by the pipeline\'s fetch stage (through getFetcher) to get the recent videos for a single channel from its public uploads feed instead of the API, returning the videos found or raising an exception on failure'
+        videos = youtubeFeed(self._getHttp()).getVideos(channelId)
+        for video in videos:
+            videos[video]["publishedAt"] = self._convertToEst(videos[video]["publishedAt"])
+        return videos
+
+    def _getVideoDetails(self, videoIds):
+        'This method is used by enrichMatches to look up the details the download rules need for each of the given videos, asking for up to _BATCH_SIZE videos per API call, and returns them as {videoId: details} along with the videos we were unable to look up'
+        # https://developers.google.com/youtube/v3/docs/videos/list
+        details = {}
+        failed = []
+        for start in range(0, len(videoIds), self._BATCH_SIZE):
+            batch = videoIds[start:start + self._BATCH_SIZE]
+            endpoint = f"/youtube/v3/videos?part=contentDetails,liveStreamingDetails,status&maxResults={self._BATCH_SIZE}&id={','.join(batch)}&key={self._getApiKey()}"
             url = self.SCHEME + self.BASE_URL + endpoint
-            self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-            r = requests.get(url=url, headers=self._headers)
-            json_data = json.loads(r.text)
-            if r.status_code == 200:
-                self.video_data["channels"][i]["videos"] = {} # This is needed first as you cannot update a dictionary with a key that doesn't exist yet
-                for item in json_data["items"]:
-                    publishedAt = self._convertToEst(item["snippet"]["publishedAt"])
-                    resourceId = item["snippet"]["resourceId"]["videoId"]
-                    title = item["snippet"]["title"]
-                    self.video_data["channels"][i]["videos"][resourceId] = {"title": title, "publishedAt": publishedAt}
+            self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+            # A live stream changes from one run to the next, so there is no point keeping these in the response cache
+            try:
+                status_code, text, unchanged = self._apiGet(url, cache=False)
+            except RuntimeError as e:
+                status_code, text = None, str(e)
+            if status_code == 200:
+                details.update({item["id"]: item for item in json.loads(text).get("items", [])})
             else:
-                self._logger.logMsg("ERROR: Unable to contact YouTube API or process request/response!")
-                self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Username: {i} :: Playlist ID: {playlistId} :: API Key: {self._apikey} :: Response Text: {json_data}")
-                exit(1)
+                self._logger.logMsg("ERROR: Unable to look up the details of the videos to download!")
+                self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Video IDs: %s :: Response Text: %s", status_code, batch, text)
+                failed.extend(batch)
+        return details, failed
 
-    def parseVideos(self):
-        'This method is used to parse the gathered video data for two pieces of criteria: If it is a new release (based on the _TIME constant) and if the Title matches (based on the titles key in config.json)'
-        for i in self.video_data["channels"]:
-            self._logger.logMsg(f"Checking videos for channel: {i}")
-            titles = self.video_data["channels"][i]["titles"]
-            for video in self.video_data["channels"][i]["videos"]:
-                title = self.video_data["channels"][i]["videos"][video]["title"]
-                publishedAt = self.video_data["channels"][i]["videos"][video]["publishedAt"]
-                if self._isNewRelease(self._getCurrentTime(), publishedAt):
+    def getFetcher(self):
+        'This method returns the config key and the method used to get the recent videos for a channel, which depends on the discovery method'
+        if self.discovery == "rss":
+            # The channel feeds are looked up by channelId rather than the uploads playlistId
+            return "channelId", self._fetchFeedVideos
+        return "playlistId", self._fetchRecentVideos
+
+    def reset(self):
+        'This method clears out everything gathered during a run so that the same object can be reused for the next run, which is what daemon mode does'
+        self.failed_channels = {}
+        self.download_results = {}
+
+    def parseChannelVideos(self, channel, videos, pollTime=None, backfill=False):
+        'This method is used to parse the recent videos of a single channel for three pieces of criteria: If we have seen it before (based on the ledger), if it is a new release (based on the last poll or the _TIME constant, unless we are backfilling) and if the Title matches (based on the titles key in config.json), and returns the videos that should be downloaded'
+        matches = []
+        self._logger.logMsg("Checking videos for channel: %s", channel)
+        titles = self.video_data["channels"][channel]["titles"]
+        matcher = self._getMatcher(channel)
+        if matcher is None:
+            # Don't mark anything as seen, so these videos get another chance once the config is fixed
+            return matches
+        lastPoll = self._ledger.getLastPoll(channel)
+        matched = dict(zip(videos, matcher.matchTitles([videos[video]["title"] for video in videos])))
+        for video in videos:
+            title = videos[video]["title"]
+            publishedAt = videos[video]["publishedAt"]
+            state = self._ledger.getState(video)
+            if state is not None:
+                self._logger.logDebugMsg("DEBUG: Video ID: %s :: State: %s :: Video has already been seen, skipping...", video, state)
+            elif backfill or self._isNewRelease(self._getCurrentTime(), publishedAt, lastPoll):
+                if backfill:
+                    self._logger.logDebugMsg("DEBUG: Found a video in the upload history! Checking to see if the title matches our criteria...")
+                else:
                     self._logger.logMsg("Found a newly released video! Checking to see if the title matches our criteria...")
-                    if self._doesTitleMatch(titles, title):
-                        self._logger.logMsg("The video matches all of our download criteria! Adding video to the download queue...")
-                        self._logger.logDebugMsg(f"DEBUG: Channel: {i} :: Video ID: {video} :: Title: {title}")
-                        self.download_queue.append(video)
-                    else:
-                        self._logger.logMsg("The video does not match all of our download criteria! Not adding video to the download queue...")
-                        self._logger.logDebugMsg(f"DEBUG: Video ID: {video} :: Title: {title} :: Criteria: {titles}")
+                if matched[video]:
+                    self._logger.logMsg("The video matches all of our download criteria! Adding video to the download queue...")
+                    self._logger.logDebugMsg("DEBUG: Channel: %s :: Video ID: %s :: Title: %s", channel, video, title)
+                    self._ledger.setState(video, self._ledger.QUEUED, channel, title, publishedAt)
+                    matches.append(video)
                 else:
-                    self._logger.logMsg("Video is not a new release! Not adding video to the download queue...")
-                    self._logger.logDebugMsg(f"DEBUG: Video ID: {video} :: Current Time: {self._getCurrentTime()} :: Published At: {publishedAt}")
+                    self._logger.logMsg("The video does not match all of our download criteria! Not adding video to the download queue...")
+                    self._logger.logDebugMsg("DEBUG: Video ID: %s :: Title: %s :: Criteria: %s", video, title, titles)
+                    self._ledger.setState(video, self._ledger.SEEN, channel, title, publishedAt)
+            else:
+                self._logger.logMsg("Video is not a new release! Not adding video to the download queue...")
+                self._logger.logDebugMsg("DEBUG: Video ID: %s :: Last Poll: %s :: Current Time: %s :: Published At: %s", video, lastPoll, self._getCurrentTime(), publishedAt)
+                self._ledger.setState(video, self._ledger.SEEN, channel, title, publishedAt)
+        if pollTime is not None:
+            self._ledger.setLastPoll(channel, pollTime)
+        return matches
 
-    def downloadVideos(self):
-        'This method is used to download all videos found in the download_queue list using the yt-dlp application (which must be installed ahead of time)'
-        # https://github.com/yt-dlp/yt-dlp
-        ii = 1
-        cmd = [] # subprocess.run handles commands better as a list of commands and arguments
+    def enrichMatches(self, matches):
+        'This method looks up the length, live status, availability and quality of the given videos with the API and checks them against the download rules of their channels, returning only the videos that should be downloaded now'
+        if len(matches) == 0:
+            return matches
+        # The uploads playlist and the channel feeds only give us a title, so without this every live stream, premiere
+        # and short that matches the titles would be handed off to yt-dlp, only to fail or download something we don't want
+        details, failed = self._getVideoDetails(matches)
+        downloads = []
+        for video in matches:
+            if video in failed:
+                # If we can't look them up then leave them alone, yt-dlp will sort out any that can't be downloaded
+                downloads.append(video)
+                continue
+            channel = self._ledger.getChannel(video)
+            rules = self._getRules(channel)
+            if rules is None:
+                # Don't download or skip anything until the rules are fixed
+                verdict, reason = youtubeRules.WAIT, "the download rules for the channel are not valid"
+            else:
+                verdict, reason = rules.check(details.get(video))
+            self._metrics.inc("video_rules_total", {"result": verdict})
+            if verdict == youtubeRules.DOWNLOAD:
+                self._ledger.setState(video, self._ledger.QUEUED)
+                downloads.append(video)
+            elif verdict == youtubeRules.WAIT:
+                self._logger.logMsg("The video can't be downloaded yet! Checking it again on the next run...")
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Video ID: %s :: Reason: %s", channel, video, reason)
+                self._ledger.setState(video, self._ledger.WAITING)
+            else:
+                self._logger.logMsg("The video does not pass the download rules! Removing video from the download queue...")
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Video ID: %s :: Reason: %s", channel, video, reason)
+                self._ledger.setState(video, self._ledger.SEEN)
+        return downloads
+
+    def _streamOutput(self, pipe, log, videoId):
+        'This method is used by _runYtdlp to pass each line yt-dlp writes to stdout or stderr into the logger as soon as it is written'
+        for line in iter(pipe.readline, b""):
+            line = line.decode("utf-8", errors="replace").rstrip()
+            if line != "":
+                log("[%s] %s", videoId, line)
+        pipe.close()
+
+    def _runYtdlp(self, videoId, url):
+        'This method is used by _downloadVideo to download a single video by running the yt-dlp program, and returns its exit code and the final paths of the files it wrote'
+        # yt-dlp writes the path it is going to save the video to into the job's path file before it starts,
+        # and the final path once the video has been moved into place. The file is kept until the job is done,
+        # so if we die partway through we still know which partly downloaded files belong to the video
+        path_file = self._journal.getPathFile(videoId)
+        cmd = [self._YTDLP, "--path", self.download_path, "--no-progress", "--continue", "--format", self.VIDEO_FORMAT, "--output", self.VIDEO_NAME,
+               "--print-to-file", f"video:{self._journal.TARGET}%(filename)s", path_file, "--print-to-file", f"after_move:{self._journal.FILE}%(filepath)s", path_file] # subprocess handles commands better as a list of commands and arguments
+        if self.concurrent_fragments > 1:
+            cmd.extend(["--concurrent-fragments", str(self.concurrent_fragments)])
+        rate = self._admission.getRateLimit(self.max_downloads)
+        if rate is not None:
+            cmd.extend(["--limit-rate", str(rate)])
+        cmd.append(url)
+        self._logger.logDebugMsg("DEBUG: Downloading Video ID: %s with Command: %s", videoId, cmd)
+        try:
+            process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+            readers = [
+                threading.Thread(target=self._streamOutput, args=(process.stdout, self._logger.logMsg, videoId), daemon=True),
+                threading.Thread(target=self._streamOutput, args=(process.stderr, self._logger.logDebugMsg, videoId), daemon=True)
+            ]
+            for reader in readers:
+                reader.start()
+            exit_code = process.wait()
+            for reader in readers:
+                reader.join()
+        except OSError as e:
+            self._logger.logMsg("ERROR: Unable to start yt-dlp!")
+            self._logger.logDebugMsg("DEBUG: Command: %s :: Exception Text: %s", cmd, e)
+            exit_code = -1
+        target, paths = self._journal.readPaths(videoId)
+        return exit_code, paths
+
+    def _getEngine(self):
+        'This method returns the pool of yt-dlp worker processes, starting it the first time it is needed with one worker per download slot'
+        if self._engine is None:
+            self._engine = youtubeEngine(self.max_downloads, self.download_path, self.VIDEO_FORMAT, self.VIDEO_NAME, self.concurrent_fragments, self._admission.getRateLimit(self.max_downloads))
+        return self._engine
+
+    def _getSize(self, paths):
+        'This method returns how many bytes are in the given files, skipping any that do not exist'
+        return sum(os.path.getsize(path) for path in paths if os.path.exists(path))
+
+    def _getWatchUrl(self, videoId):
+        'This method returns the URL yt-dlp is given for the given video'
         base_url = "www.youtube.com"
-        for i in self.download_queue:
-            endpoint = f"/watch?v={i}"
-            url = self.SCHEME + base_url + endpoint
-            self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-            self._logger.logMsg(f"Starting the download process on video #{ii} through yt-dlp...")
-            cmd = [self._YTDLP, "--path", self.download_path, "--no-progress", "--format", self.VIDEO_FORMAT, "--output", self.VIDEO_NAME, url]
-            self._logger.logDebugMsg(f"DEBUG: Downloading Video ID: {i} with Command: {cmd}")
-            result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-            self._logger.logMsg(f"{result.stdout.decode('utf-8')}")
-            self._logger.logDebugMsg(f"DEBUG: {result.stderr.decode('utf-8')}")
-            exit_code = result.returncode
-            if exit_code == 0:
-                self._logger.logMsg(f"Successfully downloaded video #{ii}!")
-                self._logger.logDebugMsg(f"DEBUG: Download Path: {self.download_path} :: URL: {url} :: Command: {cmd} :: Extra Data: {result.stdout}")
+        endpoint = f"/watch?v={videoId}"
+        return self.SCHEME + base_url + endpoint
+
+    def getEstimate(self, videoId):
+        'This method returns how many bytes the given video is expected to take up, asking yt-dlp about the formats it would download the first time, or None if the free space check is turned off or yt-dlp could not tell'
+        if not self._admission.isEnabled():
+            return None
+        if videoId not in self._estimates:
+            url = self._getWatchUrl(videoId)
+            if self.engine == "embedded":
+                self._estimates[videoId] = self._getEngine().estimate(videoId, url)
             else:
-                self._logger.logMsg("ERROR: Unable to download the video!")
-                self._logger.logDebugMsg(f"DEBUG: Download Path: {self.download_path} :: URL: {url} :: Exit Code: {exit_code} :: Command: {cmd} :: Extra Data: {result.stderr}")
-            ii += 1
+                cmd = [self._YTDLP, "--dump-json", "--no-warnings", "--format", self.VIDEO_FORMAT, url]
+                try:
+                    result = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.DEVNULL)
+                    self._estimates[videoId] = youtubeAdmission.getInfoSize(json.loads(result.stdout)) if result.returncode == 0 else None
+                except (OSError, ValueError) as e:
+                    self._logger.logDebugMsg("DEBUG: Command: %s :: Exception Text: %s", cmd, e)
+                    self._estimates[videoId] = None
+            self._logger.logDebugMsg("DEBUG: Video ID: %s :: Estimated Size: %s", videoId, self._estimates[videoId])
+        return self._estimates[videoId]
 
-    def rateVideos(self, access_token):
-        'This method is used to leave a "rating" on all videos found in the download_queue. This method only leaves the "like" rating even though the YouTube API offers other options'
-        # https://developers.google.com/youtube/v3/docs/videos/rate
-        ii = 1
-        self._headers["Authorization"] = f"Bearer {access_token}"
-        for i in self.download_queue:
-            self._logger.logMsg(f"Starting the rating process on video #{ii}...")
-            endpoint = f"/youtube/v3/videos/rate?id={i}&rating=like&key={self._apikey}"
+    def getDownloadKey(self, videoId):
+        'This method returns what the given video is sorted by in the download queue, so that videos from channels with a higher priority go first and then the smallest videos go first'
+        channel = self.video_data["channels"].get(self._ledger.getChannel(videoId), {})
+        return (-channel.get("priority", 0), self.getEstimate(videoId) or 0)
+
+    def getDownloadKeys(self, videoIds):
+        'This method returns {videoId: key} with the download queue key of each of the given videos, looking up up to max_downloads sizes at the same time'
+        if not self._admission.isEnabled() or len(videoIds) < 2:
+            # Without the free space check there are no sizes to look up, so there is nothing to wait on
+            return {video: self.getDownloadKey(video) for video in videoIds}
+        with ThreadPoolExecutor(max_workers=self.max_downloads) as executor:
+            return dict(zip(videoIds, executor.map(self.getDownloadKey, videoIds)))
+
+    def _downloadVideo(self, videoId, number):
+        'This method is used by the pipeline\'s download stage to download a single video through yt-dlp and return a result record with the exit code, duration and bytes written, skipping it if the journal shows it was already downloaded'
+        # https://github.com/yt-dlp/yt-dlp
+        url = self._getWatchUrl(videoId)
+        job = self._journal.getJob(videoId)
+        if job is not None and job["state"] == self._journal.DONE and job["target"] is not None and os.path.exists(job["target"]):
+            # We finished the download last time but did not get as far as recording it in the ledger
+            self._logger.logMsg("Video #%s has already been downloaded! Skipping...", number)
+            return {"exitCode": 0, "duration": 0.0, "bytes": self._getSize([job["target"]])}
+        if self._admission.isEnabled():
+            if not self._admission.admit(videoId, self.download_path, self.getEstimate(videoId)):
+                # This isn't counted as a failed attempt, the video stays queued in the ledger until there is room for it
+                self._logger.logMsg("WARNING: Not enough free space in the download path for video #%s! Will try again on the next run...", number)
+                return {"exitCode": None, "duration": 0.0, "bytes": 0}
+        if job is not None and job["state"] == self._journal.RUNNING:
+            target, paths = self._journal.readPaths(videoId)
+            partial = self._journal.hasPartial(target)
+            self._journal.setState(videoId, self._journal.RUNNING, target, partial)
+            self._logger.logMsg("Resuming the interrupted download of video #%s...", number)
+            self._logger.logDebugMsg("DEBUG: Video ID: %s :: Target: %s :: Partial Files: %s", videoId, target, partial)
+        else:
+            self._journal.setState(videoId, self._journal.RUNNING)
+        self._logger.logMsg("Starting the download process on video #%s through yt-dlp...", number)
+        start = time.monotonic()
+        try:
+            if self.engine == "embedded":
+                exit_code, paths = self._getEngine().download(videoId, url, self._journal.getPathFile(videoId))
+            else:
+                exit_code, paths = self._runYtdlp(videoId, url)
+        finally:
+            if self._admission.isEnabled():
+                self._admission.release(videoId)
+        duration = time.monotonic() - start
+        size = self._getSize(paths)
+        if exit_code == 0:
+            self._journal.finish(videoId, self._journal.DONE, paths[0] if len(paths) > 0 else None)
+        else:
+            self._journal.finish(videoId, self._journal.FAILED, self._journal.readPaths(videoId)[0])
+        self._metrics.observe("download_duration_seconds", duration, {"engine": self.engine})
+        self._metrics.inc("downloads_total", {"result": "success" if exit_code == 0 else "failure"})
+        self._metrics.inc("download_bytes_total", amount=size)
+        if exit_code == 0:
+            self._logger.logMsg("Successfully downloaded video #%s!", number)
+            self._logger.logDebugMsg("DEBUG: Download Path: %s :: URL: %s :: Duration: %.2fs :: Bytes Written: %s", self.download_path, url, duration, size)
+        else:
+            self._logger.logMsg("ERROR: Unable to download video #%s!", number)
+            self._logger.logDebugMsg("DEBUG: Download Path: %s :: URL: %s :: Exit Code: %s :: Engine: %s", self.download_path, url, exit_code, self.engine)
+        return {"exitCode": exit_code, "duration": duration, "bytes": size}
+
+    def recordDownload(self, videoId, result):
+        'This method saves the result record of a download and moves the video along in the ledger, returning whether the download succeeded'
+        self.download_results[videoId] = result
+        if result["exitCode"] is None:
+            # The download was never started, so it is left in the queue for the next run
+            return False
+        if result["exitCode"] == 0:
+            self._ledger.setState(videoId, self._ledger.DOWNLOADED)
+            return True
+        self._ledger.recordFailure(videoId)
+        return False
+
+    def _getRatings(self, videoIds, access_token):
+        'This method is used by rateVideos to look up the rating we have already left on each of the given videos, asking for up to _BATCH_SIZE videos per API call'
+        # https://developers.google.com/youtube/v3/docs/videos/getRating
+        ratings = {}
+        headers = {"Authorization": f"Bearer {access_token}"}
+        for start in range(0, len(videoIds), self._BATCH_SIZE):
+            batch = videoIds[start:start + self._BATCH_SIZE]
+            endpoint = f"/youtube/v3/videos/getRating?id={','.join(batch)}&key={self._getApiKey()}"
             url = self.SCHEME + self.BASE_URL + endpoint
-            self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-            r = requests.post(url=url, headers=self._headers)
-            if r.status_code == 204:
-                self._logger.logMsg("Successfully left a like on the video!")
+            self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+            try:
+                r = self._getHttp().get(url, "videos/getRating", lambda: self._quota.spend("videos/getRating", key=self._getUrlKey(url)), headers=headers)
+                status_code, text = r.status_code, r.text
+            except RuntimeError as e:
+                status_code, text = None, str(e)
+            if status_code == 200:
+                for item in json.loads(text).get("items", []):
+                    ratings[item["videoId"]] = item["rating"]
             else:
-                json_data = json.loads(r.text)
-                self._logger.logMsg("ERROR: Unable to leave a rating on the video!")
-                self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Video ID: {i} :: Response Text: {json_data}")
-            ii += 1
\ No newline at end of file
+                # This is only an optimization, so if it fails we just rate everything in the batch
+                self._logger.logMsg("ERROR: Unable to look up the existing ratings on the videos!")
+                self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Video IDs: %s :: Response Text: %s", status_code, batch, text)
+        return ratings
+
+    def _rateVideo(self, videoId, access_token, number):
+        'This method is used by rateVideos to leave a "like" rating on a single video, which the HTTP client retries with backoff if we are rate limited or the API has a server error, and returns whether it succeeded'
+        # https://developers.google.com/youtube/v3/docs/videos/rate
+        self._logger.logMsg("Starting the rating process on video #%s...", number)
+        endpoint = f"/youtube/v3/videos/rate?id={videoId}&rating=like&key={self._getApiKey()}"
+        url = self.SCHEME + self.BASE_URL + endpoint
+        headers = {"Authorization": f"Bearer {access_token}"}
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+        try:
+            r = self._getHttp().post(url, "videos/rate", lambda: self._quota.spend("videos/rate", key=self._getUrlKey(url)), headers=headers)
+            status_code, text = r.status_code, r.text
+        except RuntimeError as e:
+            status_code, text = None, str(e)
+        if status_code == 204:
+            self._logger.logMsg("Successfully left a like on video #%s!", number)
+            return True
+        # The video stays in the downloaded state in the ledger, so it will be rated on the next run
+        self._logger.logMsg("ERROR: Unable to leave a rating on video #%s!", number)
+        self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Video ID: %s :: Response Text: %s", status_code, videoId, text)
+        return False
+
+    @youtubeMetrics.timed("rateVideos")
+    def rateVideos(self, access_token, videoIds):
+        'This method is used to leave a "rating" on all of the given videos and returns how many are now rated. This method only leaves the "like" rating even though the YouTube API offers other options'
+        rated = 0
+        # Rating a video costs 50 times as much quota as checking whether we already have,
+        # so find out which videos are already liked before we start
+        ratings = self._getRatings(videoIds, access_token)
+        jobs = {}
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            ii = 1
+            for i in videoIds:
+                if ratings.get(i) == "like":
+                    self._logger.logMsg("Video #%s has already been liked! Skipping...", ii)
+                    self._ledger.setState(i, self._ledger.RATED)
+                    rated += 1
+                elif not self._quota.canAfford("videos/rate", reserve=self._getPollingReserve()):
+                    # The video stays in the downloaded state in the ledger, so it will be rated once the quota resets
+                    self._logger.logMsg("WARNING: Not enough quota remaining to rate video #%s! Will try again once the quota resets...", ii)
+                else:
+                    # Most of the jobs are submitted before any of them are sent, so each one sets its rating aside until it is done
+                    self._quota.reserve("videos/rate")
+                    job = executor.submit(self._rateVideo, i, access_token, ii)
+                    job.add_done_callback(lambda job: self._quota.settle("videos/rate"))
+                    jobs[job] = i
+                ii += 1
+            for job in as_completed(jobs):
+                if job.result():
+                    self._ledger.setState(jobs[job], self._ledger.RATED)
+                    rated += 1
+        return rated
@@ -0,0 +1,27 @@
+#!/usr/bin/env python3
+
+class youtubeDatabase():
+    'This class serves to support every class that keeps its records in the shared youtubeDL.db file by holding the settings each of their connections to it has to agree on'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    BUSY_TIMEOUT = 30 # This is how many seconds every connection to the database waits for another process (or thread) to finish writing to it before giving up
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
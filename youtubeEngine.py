@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+import atexit, importlib.util, threading
+
+# These live in each worker process, which is why they are not part of the youtubeEngine class
+_ydl = None # This is the one yt_dlp.YoutubeDL each worker process sets up and reuses for every video it downloads
+_events = None # This is the queue each worker process sends its progress and log messages back on
+_progress = {} # This remembers how far along each download in this worker process was the last time we reported it
+_PROGRESS_STEP = 25 # The progress of each download is only reported every time it passes another this many percent
+
+class _youtubeEngineLogger():
+    'This class serves to pass the messages yt-dlp would have printed back to the main process instead, so they end up in the log'
+
+    def debug(self, msg):
+        # yt-dlp sends its regular output through debug as well, prefixed with "[debug] " when it really is debug output
+        if msg.startswith("[debug] "):
+            _events.put(("log", "debug", msg))
+        else:
+            _events.put(("log", "info", msg))
+
+    def info(self, msg):
+        _events.put(("log", "info", msg))
+
+    def warning(self, msg):
+        _events.put(("log", "debug", msg))
+
+    def error(self, msg):
+        _events.put(("log", "info", msg))
+
+def _startWorker(options, events):
+    'This function runs once in each worker process to import yt-dlp and set up the yt_dlp.YoutubeDL that every download in this process shares'
+    global _ydl, _events
+    import yt_dlp
+    _events = events
+    options = dict(options)
+    options.update({
+        "logger": _youtubeEngineLogger(),
+        "progress_hooks": [_progressHook],
+        "quiet": True
+    })
+    _ydl = yt_dlp.YoutubeDL(options)
+
+def _progressHook(d):
+    'This function is called by yt-dlp as each download (and each fragment of it) makes progress'
+    # https://github.com/yt-dlp/yt-dlp/blob/master/yt_dlp/YoutubeDL.py (see progress_hooks)
+    # This is called many times a second, so only a few of the calls are passed on to the main process
+    videoId = d.get("info_dict", {}).get("id")
+    downloaded = d.get("downloaded_bytes")
+    total = d.get("total_bytes") or d.get("total_bytes_estimate")
+    if d.get("status") == "finished":
+        _progress.pop(d.get("filename"), None)
+        _events.put(("progress", videoId, "finished", downloaded, total, None))
+    elif d.get("status") == "downloading" and downloaded is not None and total:
+        percent = int(downloaded * 100 / total) // _PROGRESS_STEP * _PROGRESS_STEP
+        if percent > _progress.get(d.get("filename"), -1):
+            _progress[d.get("filename")] = percent
+            _events.put(("progress", videoId, "downloading", percent, total, d.get("speed")))
+
+def _estimate(videoId, url):
+    'This function runs in a worker process to work out how big a video will be from the formats yt-dlp picks for it, without downloading it'
+    from youtubeAdmission import youtubeAdmission
+    try:
+        info = _ydl.extract_info(url, download=False)
+    except Exception as e:
+        _events.put(("log", "debug", f"[{videoId}] Unable to estimate the size of the video: {e}"))
+        return None
+    return youtubeAdmission.getInfoSize(info or {})
+
+def _download(videoId, url, path_file):
+    'This function runs in a worker process to download a single video and returns its exit code and the final paths of the files it wrote, which are also written to the job\'s path file just like the yt-dlp program does'
+    from youtubeJournal import youtubeJournal
+    try:
+        # The downloading stays on the worker process's shared YoutubeDL, so its caches (like the player
+        # code it needs to work out the video URLs) are reused instead of being rebuilt for every video
+        info = _ydl.extract_info(url, download=False)
+        # The path the video is going to be saved to is written down before the download starts, so if we
+        # die partway through we still know which partly downloaded files belong to the video
+        with open(path_file, "a") as file:
+            file.write(f"{youtubeJournal.TARGET}{_ydl.prepare_filename(info)}\n")
+        info = _ydl.process_ie_result(info, download=True)
+    except Exception as e:
+        _events.put(("log", "info", f"[{videoId}] ERROR: {e}"))
+        return 1, []
+    paths = [download.get("filepath") for download in (info or {}).get("requested_downloads", [])]
+    paths = [path for path in paths if path is not None]
+    with open(path_file, "a") as file:
+        file.writelines(f"{youtubeJournal.FILE}{path}\n" for path in paths)
+    return 0, paths
+
+class youtubeEngine():
+    'This class serves to support the youtubeDL class by downloading videos through the yt-dlp Python API in a pool of long lived worker processes, instead of starting the yt-dlp program again for every video'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, workers, download_path, video_format, video_name, concurrent_fragments=1, rate_limit=None):
+        # These are only imported when the embedded engine is used, so the subprocess engine doesn't pay for them
+        from concurrent.futures import ProcessPoolExecutor
+        import multiprocessing
+        # The workers are started fresh rather than forked, because forking a process that is already running threads is not safe
+        context = multiprocessing.get_context("spawn")
+        self._events = context.Queue()
+        options = {
+            # These match the options the youtubeDL class passes to the yt-dlp program
+            "paths": {"home": download_path},
+            "format": video_format,
+            "outtmpl": video_name,
+            "noprogress": True,
+            "continuedl": True, # Pick up partly downloaded files where they left off
+            "concurrent_fragment_downloads": concurrent_fragments,
+            "ratelimit": rate_limit # This is each worker's share of the bandwidth budget
+        }
+        self._pool = ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=_startWorker, initargs=(options, self._events))
+        self._reader = threading.Thread(target=self._readEvents, name="engine-events", daemon=True)
+        self._reader.start()
+        atexit.register(self.close)
+
+    @staticmethod
+    def isAvailable():
+        'This method runs a test to see if the yt-dlp Python package is installed'
+        return importlib.util.find_spec("yt_dlp") is not None
+
+    def _readEvents(self):
+        'This method runs on a background thread and passes the progress and log messages sent by the worker processes into the logger'
+        while True:
+            event = self._events.get()
+            if event is None:
+                break
+            if event[0] == "log":
+                if event[1] == "debug":
+                    self._logger.logDebugMsg("DEBUG: %s", event[2])
+                else:
+                    self._logger.logMsg("%s", event[2])
+            elif event[0] == "progress":
+                kind, videoId, status, progress, total, speed = event
+                if status == "finished":
+                    self._logger.logDebugMsg("DEBUG: [%s] Finished downloading %s bytes", videoId, progress)
+                else:
+                    self._logger.logDebugMsg("DEBUG: [%s] Downloaded %s%% of %s bytes at %s bytes/s", videoId, progress, total, speed)
+
+    def download(self, videoId, url, path_file):
+        'This method downloads a single video on one of the worker processes and returns its exit code and the final paths of the files it wrote, waiting for it to finish. The target and final paths are written to the given path file as well'
+        try:
+            exit_code, paths = self._pool.submit(_download, videoId, url, path_file).result()
+        except Exception as e:
+            # This only happens if a worker process could not start or died, the video will be tried again on the next run
+            self._logger.logMsg("ERROR: The yt-dlp worker process was unable to download the video!")
+            self._logger.logDebugMsg("DEBUG: Video ID: %s :: Exception Text: %s", videoId, e)
+            return -1, []
+        return exit_code, paths
+
+    def estimate(self, videoId, url):
+        'This method returns how many bytes the given video is expected to take up, or None if yt-dlp could not tell, waiting for one of the worker processes to work it out'
+        try:
+            return self._pool.submit(_estimate, videoId, url).result()
+        except Exception as e:
+            self._logger.logDebugMsg("DEBUG: Video ID: %s :: Exception Text: %s", videoId, e)
+            return None
+
+    def close(self):
+        'This method stops the worker processes and the background thread once every download has finished'
+        if self._pool is None:
+            return
+        self._pool.shutdown(wait=True)
+        self._pool = None
+        self._events.put(None)
+        self._reader.join()
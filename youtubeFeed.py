@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from urllib.parse import urlsplit
+import os
+import xml.etree.ElementTree as ET
+
+class youtubeFeed():
+    'This class serves to support the youtubeDL class by finding recent uploads through each channel\'s public Atom feed, which does not cost any YouTube API quota'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _CHUNK_SIZE = 8192 # This is how many bytes of the feed we hand to the parser at a time
+    _ATOM = "{http://www.w3.org/2005/Atom}"
+    _YT = "{http://www.youtube.com/xml/schemas/2015}"
+    _FEED_URL = urlsplit(os.environ.get("YOUTUBEDL_FEED_URL", "https://www.youtube.com")) # This can be pointed at a stand-in server with the YOUTUBEDL_FEED_URL environment variable
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    SCHEME = _FEED_URL.scheme + "://"
+    BASE_URL = _FEED_URL.netloc
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, http):
+        self._http = http # This is the shared HTTP client from the youtubeDL class
+
+    def getVideos(self, channelId):
+        'This method returns the videos in the given channel\'s uploads feed as {videoId: {title, publishedAt}}, where publishedAt is still in the feed\'s ISO 8601 format, or raises an exception on failure'
+        endpoint = f"/feeds/videos.xml?channel_id={channelId}"
+        url = self.SCHEME + self.BASE_URL + endpoint
+        self._logger.logDebugMsg("DEBUG: Calling YouTube Feed via URL: %s", url)
+        videos = {}
+        with self._http.get(url, "feeds/videos.xml", stream=True) as r:
+            if r.status_code != 200:
+                raise RuntimeError(f"HTTP Response Code: {r.status_code}")
+            # Parse the feed as it arrives instead of waiting for the whole thing, and throw
+            # away each entry once we've pulled out what we need so memory stays flat
+            parser = ET.XMLPullParser(events=("end",))
+            for chunk in r.iter_content(chunk_size=self._CHUNK_SIZE):
+                parser.feed(chunk)
+                self._readEntries(parser, videos)
+            parser.close()
+            self._readEntries(parser, videos)
+        return videos
+
+    def _readEntries(self, parser, videos):
+        'This method is used by getVideos to pull every finished <entry> element out of the parser and add it to the videos dictionary'
+        for event, element in parser.read_events():
+            if element.tag == self._ATOM + "entry":
+                videoId = element.findtext(self._YT + "videoId")
+                title = element.findtext(self._ATOM + "title")
+                publishedAt = element.findtext(self._ATOM + "published")
+                if videoId is not None and publishedAt is not None:
+                    videos[videoId] = {"title": title or "", "publishedAt": publishedAt}
+                element.clear()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeMetrics import youtubeMetrics
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+from urllib.parse import urlsplit
+import random, threading, time
+
+class youtubeHttp():
+    'This class serves to support the youtubeDL and youtubeOauth classes by making every HTTP request through one pooled session with timeouts, retrying rate limited and failed requests with backoff, and failing fast on an endpoint that keeps failing'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _CONNECT_TIMEOUT = 5 # This is how many seconds we wait to connect to a server before giving up on the attempt
+    _READ_TIMEOUT = 30 # This is how many seconds we wait for a server to send anything before giving up on the attempt
+    _MAX_RETRIES = 3 # This is how many times we will retry a request that was rate limited, hit a server error or timed out
+    _BACKOFF = 1 # This is how many seconds the first retry waits at most, doubling after each attempt
+    _MAX_WAIT = 60 # This is the longest we will wait before a retry, a server that asks us to wait longer than this is given up on for that long instead
+    _RETRY_CODES = (429, 500, 502, 503, 504) # These are the responses that are worth trying again
+    _FAILURE_THRESHOLD = 5 # This is how many requests in a row to one endpoint have to fail before we stop sending it any more
+    _COOLDOWN = 30 # This is how many seconds an endpoint is left alone once it has failed too many times, before we try it again
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+    _metrics = youtubeMetrics() # Bring in our metrics class so every request, retry and tripped circuit can be counted
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, pool_size=1, headers=None):
+        self._pool_size = pool_size # This is how many connections to each server are kept open, which should be at least how many threads share the session
+        self._headers = headers or {}
+        self._session = None # This is created the first time a request is made
+        self._lock = threading.Lock() # The session and the circuits are shared by every worker thread
+        self._circuits = {} # This maps each endpoint to how many requests to it have failed in a row and when it can be tried again
+
+    @staticmethod
+    def getEndpoint(url):
+        'This method returns the name of the endpoint being called by the given URL, such as "search", "videos/rate" or "token"'
+        return urlsplit(url).path.replace("/youtube/v3/", "", 1).lstrip("/")
+
+    def _getSession(self):
+        'This method returns the pooled requests.Session, creating it the first time it is needed'
+        with self._lock:
+            if self._session is None:
+                import requests # This is imported the first time we need it so that commands which never make a request start faster
+                self._session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=self._pool_size, pool_maxsize=self._pool_size)
+                self._session.mount("http://", adapter)
+                self._session.mount("https://", adapter)
+                self._session.headers.update(self._headers)
+                self._session.hooks["response"].append(self._metrics.observeResponse) # This counts and times every request made through the session
+            return self._session
+
+    def _getRetryAfter(self, r):
+        'This method returns how many seconds the server asked us to wait in its Retry-After header, which is either a number of seconds or a date, or None if it did not say'
+        value = r.headers.get("Retry-After")
+        if value is None:
+            return None
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+        try:
+            return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0)
+        except (TypeError, ValueError):
+            return None
+
+    def _getBackoff(self, attempt):
+        'This method returns how long to wait before the given retry, which grows exponentially and is picked at random up to that so the worker threads don\'t all retry at the same moment'
+        # https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+        return random.uniform(0, min(self._MAX_WAIT, self._BACKOFF * 2 ** attempt))
+
+    def _allowRequest(self, endpoint):
+        'This method runs a test to see if a request to the given endpoint can be sent, which it can unless the endpoint has failed too many times in a row and is still cooling down. Once it has cooled down, a single trial request is let through to see if it has recovered'
+        with self._lock:
+            circuit = self._circuits.get(endpoint)
+            if circuit is None or circuit["failures"] < self._FAILURE_THRESHOLD:
+                return True
+            now = time.monotonic()
+            if now < circuit["openUntil"]:
+                return False
+            # Only this request gets through until it comes back, or until another cooldown has passed
+            circuit["openUntil"] = now + self._COOLDOWN
+            return True
+
+    def _recordSuccess(self, endpoint):
+        'This method closes the circuit for the given endpoint, since it has answered'
+        with self._lock:
+            self._circuits.pop(endpoint, None)
+
+    def _recordFailure(self, endpoint, retry_after=None):
+        'This method counts a failed request to the given endpoint, and opens its circuit for _COOLDOWN seconds once too many have failed in a row (which includes a failed trial request), or straight away for as long as the server asked us to wait'
+        cooldown = self._COOLDOWN if retry_after is None else retry_after
+        with self._lock:
+            circuit = self._circuits.setdefault(endpoint, {"failures": 0, "openUntil": 0})
+            circuit["failures"] += 1
+            if retry_after is not None:
+                # The server told us how long to leave it alone for, so there is no need to wait for more failures
+                circuit["failures"] = max(circuit["failures"], self._FAILURE_THRESHOLD)
+            if circuit["failures"] < self._FAILURE_THRESHOLD:
+                return
+            circuit["openUntil"] = time.monotonic() + cooldown
+        self._metrics.inc("http_circuit_opens_total", {"endpoint": endpoint})
+        self._logger.logMsg("WARNING: The %s endpoint is failing! Not sending it any more requests for %.0f seconds...", endpoint, cooldown)
+
+    def request(self, method, url, endpoint=None, onAttempt=None, **kwargs):
+        'This method sends an HTTP request and returns the response, retrying with backoff if it was rate limited, hit a server error or timed out. It raises a RuntimeError if no response could be had or the endpoint is failing, so the caller can give up on just that item. onAttempt is called before every attempt, which is how the quota gets charged for retries too'
+        import requests # This is only needed for its exceptions, and is imported by _getSession anyway
+        if endpoint is None:
+            endpoint = self.getEndpoint(url)
+        kwargs.setdefault("timeout", (self._CONNECT_TIMEOUT, self._READ_TIMEOUT))
+        attempt = 0
+        while True:
+            if not self._allowRequest(endpoint):
+                self._metrics.inc("http_circuit_rejections_total", {"endpoint": endpoint})
+                raise RuntimeError(f"The {endpoint} endpoint has failed too many times in a row, not sending it any more requests for now")
+            if onAttempt is not None:
+                onAttempt()
+            session = self._getSession()
+            try:
+                r = session.request(method, url, **kwargs)
+            except requests.RequestException as e:
+                # Nothing came back, which is the same as a server error as far as retrying is concerned
+                r = None
+                error = e
+            if r is not None and r.status_code not in self._RETRY_CODES:
+                self._recordSuccess(endpoint)
+                return r
+            retry_after = None if r is None else self._getRetryAfter(r)
+            if retry_after is not None and retry_after > self._MAX_WAIT:
+                # There is no point hanging around that long, so leave the endpoint alone until then
+                self._recordFailure(endpoint, retry_after)
+                return r
+            self._recordFailure(endpoint)
+            if attempt >= self._MAX_RETRIES:
+                if r is None:
+                    raise RuntimeError(f"Unable to get a response from the {endpoint} endpoint after {attempt + 1} attempts: {error}")
+                return r
+            wait = self._getBackoff(attempt) if retry_after is None else retry_after
+            self._logger.logMsg("The request to the %s endpoint failed with %s! Will try again in %.1f seconds...", endpoint, f"HTTP {r.status_code}" if r is not None else "no response", wait)
+            if r is None:
+                self._logger.logDebugMsg("DEBUG: URL: %s :: Exception Text: %s", url, error)
+            else:
+                r.close() # Give the connection back to the pool before we wait
+            self._metrics.inc("api_retries_total", {"endpoint": endpoint})
+            time.sleep(wait)
+            attempt += 1
+
+    def get(self, url, endpoint=None, onAttempt=None, **kwargs):
+        'This method sends an HTTP GET request through request'
+        return self.request("GET", url, endpoint, onAttempt, **kwargs)
+
+    def post(self, url, endpoint=None, onAttempt=None, **kwargs):
+        'This method sends an HTTP POST request through request'
+        return self.request("POST", url, endpoint, onAttempt, **kwargs)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from datetime import datetime
+import sqlite3, glob, os, threading
+
+class youtubeJournal():
+    'This class serves to support the youtubeDL class by writing down each download job before it starts and after it ends, so that a run that dies partway through can resume the downloads it interrupted and skip the ones it already finished'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _JOBS_DIR = _PATH + "/jobs" # yt-dlp writes the paths of each job's files here, so we still have them if we crash
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    RUNNING = "running" # The download has started but has not finished, if a job is still running when we start up it was interrupted
+    DONE = "done" # The download finished and the file is in the download path
+    FAILED = "failed" # yt-dlp gave up on the download
+    # These start each line yt-dlp writes to a job's path file, to tell the path it is going to save to apart from the files it finished
+    TARGET = "target "
+    FILE = "file "
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The downloads run on worker threads
+        try:
+            os.makedirs(self._JOBS_DIR, exist_ok=True)
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS jobs (videoId TEXT PRIMARY KEY, state TEXT NOT NULL, target TEXT, partial INTEGER NOT NULL DEFAULT 0, updatedAt TEXT NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state)")
+        except (OSError, sqlite3.Error) as e:
+            self._logger.logMsg("ERROR: Unable to open the download journal: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getCurrentTime(self):
+        'This method gets the current time in the same format the youtubeDL class uses'
+        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+    def getPathFile(self, videoId):
+        'This method returns the file yt-dlp writes the paths of the given video\'s files to, which is kept until the job is done'
+        return os.path.join(self._JOBS_DIR, f"{videoId}.path")
+
+    def readPaths(self, videoId):
+        'This method returns the target path yt-dlp chose for the given video (or None if it never got that far) and the final paths of any files it finished'
+        try:
+            with open(self.getPathFile(videoId), "r") as file:
+                lines = [line for line in file.read().splitlines() if line != ""]
+        except FileNotFoundError:
+            return None, []
+        # yt-dlp writes the target line again every time the job is retried, so the last one is the current one
+        targets = [line[len(self.TARGET):] for line in lines if line.startswith(self.TARGET)]
+        paths = [line[len(self.FILE):] for line in lines if line.startswith(self.FILE)]
+        if len(targets) == 0:
+            return None, paths
+        return targets[-1], paths
+
+    def hasPartial(self, target):
+        'This method runs a test to see if yt-dlp left any partly downloaded files for the given target path, which it will pick up from where it left off'
+        if target is None:
+            return False
+        return len(glob.glob(glob.escape(os.path.splitext(target)[0]) + ".*part")) > 0
+
+    def getJob(self, videoId):
+        'This method returns the state and target path of the given job, or None if it has never been started'
+        with self._lock:
+            row = self._db.execute("SELECT state, target FROM jobs WHERE videoId = ?", (videoId,)).fetchone()
+        if row is None:
+            return None
+        return {"state": row[0], "target": row[1]}
+
+    def setState(self, videoId, state, target=None, partial=False):
+        'This method records the state of the given job, keeping the target path we already had if no new one is given'
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO jobs (videoId, state, target, partial, updatedAt) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (videoId) DO UPDATE SET state = excluded.state, target = COALESCE(excluded.target, target), partial = excluded.partial, updatedAt = excluded.updatedAt",
+                (videoId, state, target, int(partial), self._getCurrentTime())
+            )
+
+    def finish(self, videoId, state, target=None):
+        'This method records that the given job has ended and cleans up its path file once it is done'
+        self.setState(videoId, state, target, self.hasPartial(target))
+        if state == self.DONE:
+            try:
+                os.remove(self.getPathFile(videoId))
+            except FileNotFoundError:
+                pass
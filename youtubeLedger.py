@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from datetime import datetime
+import sqlite3, os, threading
+
+class youtubeLedger():
+    'This class serves to support the youtubeDL class by keeping an on-disk record of every video we have seen and what we have done with it, so that no video is downloaded or rated twice and no video is missed between runs'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _MAX_ATTEMPTS = 3 # This is how many times we will try to download a video before we give up on it
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    # These are the states a video moves through, in order
+    SEEN = "seen" # We saw the video but it did not match our download criteria
+    QUEUED = "queued" # The video matched our download criteria but has not been downloaded yet
+    WAITING = "waiting" # The video matched our download criteria but can't be downloaded yet (such as a live stream or premiere that hasn't finished), so it is checked again on the next run
+    DOWNLOADED = "downloaded" # The video has been downloaded but has not been rated yet
+    RATED = "rated" # The video has been downloaded and liked, there is nothing left to do
+    FAILED = "failed" # The video could not be downloaded after _MAX_ATTEMPTS tries
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The download and rating stages use the ledger from worker threads
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS videos (videoId TEXT PRIMARY KEY, channel TEXT, title TEXT, publishedAt TEXT, state TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, updatedAt TEXT NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS videos_state ON videos (state)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS videos_channel ON videos (channel, publishedAt)")
+                self._db.execute("CREATE TABLE IF NOT EXISTS polls (channel TEXT PRIMARY KEY, lastPoll TEXT NOT NULL)")
+                # pageToken is the next page of the channel's uploads to backfill, which is NULL once every page is done
+                self._db.execute("CREATE TABLE IF NOT EXISTS backfills (channel TEXT PRIMARY KEY, pageToken TEXT, pages INTEGER NOT NULL DEFAULT 0, finished INTEGER NOT NULL DEFAULT 0, updatedAt TEXT NOT NULL)")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the ledger database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getCurrentTime(self):
+        'This method gets the current time in the same format the youtubeDL class uses'
+        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+    def getState(self, videoId):
+        'This method returns the current state of the given video or None if we have never seen it before'
+        with self._lock:
+            row = self._db.execute("SELECT state FROM videos WHERE videoId = ?", (videoId,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def setState(self, videoId, state, channel=None, title=None, publishedAt=None):
+        'This method records the state of the given video, adding it to the ledger if we have never seen it before'
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO videos (videoId, channel, title, publishedAt, state, updatedAt) VALUES (?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (videoId) DO UPDATE SET state = excluded.state, updatedAt = excluded.updatedAt, "
+                "channel = COALESCE(excluded.channel, channel), title = COALESCE(excluded.title, title), publishedAt = COALESCE(excluded.publishedAt, publishedAt)",
+                (videoId, channel, title, publishedAt, state, self._getCurrentTime())
+            )
+
+    def recordFailure(self, videoId):
+        'This method records a failed download attempt, moving the video to the failed state once it has used up all of its attempts'
+        with self._lock, self._db:
+            self._db.execute("UPDATE videos SET attempts = attempts + 1, updatedAt = ? WHERE videoId = ?", (self._getCurrentTime(), videoId))
+            self._db.execute("UPDATE videos SET state = ? WHERE videoId = ? AND attempts >= ?", (self.FAILED, videoId, self._MAX_ATTEMPTS))
+
+    def getChannel(self, videoId):
+        'This method returns the channel the given video belongs to or None if we have never seen it before'
+        with self._lock:
+            row = self._db.execute("SELECT channel FROM videos WHERE videoId = ?", (videoId,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def getVideos(self, state):
+        'This method returns a list of every videoId currently in the given state, oldest first'
+        with self._lock:
+            rows = self._db.execute("SELECT videoId FROM videos WHERE state = ? ORDER BY updatedAt", (state,)).fetchall()
+        return [row[0] for row in rows]
+
+    def getPublishTimes(self, channel, limit=20):
+        'This method returns the publishedAt times of the most recent videos we have seen from the given channel, newest first'
+        with self._lock:
+            rows = self._db.execute("SELECT publishedAt FROM videos WHERE channel = ? AND publishedAt IS NOT NULL ORDER BY publishedAt DESC LIMIT ?", (channel, limit)).fetchall()
+        return [row[0] for row in rows]
+
+    def getLastPoll(self, channel):
+        'This method returns the time of the last successful poll of the given channel or None if it has never been polled'
+        with self._lock:
+            row = self._db.execute("SELECT lastPoll FROM polls WHERE channel = ?", (channel,)).fetchone()
+        if row is None:
+            return None
+        return row[0]
+
+    def setLastPoll(self, channel, timestamp):
+        'This method records the time of the last successful poll of the given channel'
+        with self._lock, self._db:
+            self._db.execute("INSERT INTO polls (channel, lastPoll) VALUES (?, ?) ON CONFLICT (channel) DO UPDATE SET lastPoll = excluded.lastPoll", (channel, timestamp))
+
+    def getBackfill(self, channel):
+        'This method returns how far the backfill of the given channel has got, as the next pageToken, how many pages are done and whether it has finished, or None if it has never been started'
+        with self._lock:
+            row = self._db.execute("SELECT pageToken, pages, finished FROM backfills WHERE channel = ?", (channel,)).fetchone()
+        if row is None:
+            return None
+        return {"pageToken": row[0], "pages": row[1], "finished": bool(row[2])}
+
+    def setBackfill(self, channel, pageToken):
+        'This method records that another page of the given channel\'s backfill is done and which page comes next, where a pageToken of None means that was the last page'
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO backfills (channel, pageToken, pages, finished, updatedAt) VALUES (?, ?, 1, ?, ?) "
+                "ON CONFLICT (channel) DO UPDATE SET pageToken = excluded.pageToken, pages = pages + 1, finished = excluded.finished, updatedAt = excluded.updatedAt",
+                (channel, pageToken, int(pageToken is None), self._getCurrentTime())
+            )
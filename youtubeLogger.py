@@ -1,6 +1,38 @@
 #!/usr/bin/env python3
-from datetime import datetime
-import logging, logging.config, os, sys
+import atexit, json, logging, logging.handlers, os, queue, threading
+
+class youtubeFormatter(logging.Formatter):
+    'This class serves to format log records in the standard SYSLOG style used by the youtubeDL.log file'
+
+    def format(self, record):
+        record.hostname = youtubeLogger._HOSTNAME
+        record.program = youtubeLogger._PROGRAM
+        return super().format(record)
+
+class youtubeJsonFormatter(logging.Formatter):
+    'This class serves to format log records as one JSON object per line, for when the logs are read by another program instead of a person'
+
+    def format(self, record):
+        data = {
+            "time": self.formatTime(record, "%Y-%m-%dT%H:%M:%S"),
+            "host": youtubeLogger._HOSTNAME,
+            "program": youtubeLogger._PROGRAM,
+            "pid": record.process,
+            "thread": record.threadName,
+            "level": record.levelname,
+            "message": record.getMessage()
+        }
+        if record.exc_info:
+            data["exception"] = self.formatException(record.exc_info)
+        return json.dumps(data)
+
+class youtubeQueueHandler(logging.handlers.QueueHandler):
+    'This class serves to hand log records to the background writer thread without formatting them first, so the calling thread does as little work as possible'
+
+    def prepare(self, record):
+        # The standard QueueHandler formats the message here on the calling thread, but
+        # the queue never leaves this process so the record can be passed along as it is
+        return record
 
 class youtubeLogger():
     'This class servers to support the youtubeDL and youtubeOauth classes through standardized log formatting'
@@ -16,17 +48,20 @@ class youtubeLogger():
     #########################
     _HOSTNAME = os.uname().nodename
     _PATH = os.path.dirname(os.path.realpath(__file__))
-    _PID = os.getpid()
     _PROGRAM = "youtubeDL"
-    _TIME_FORMAT = "%b %d %H:%M:%S"
+    _NAME = "youtubeDL" # This is the name of the logger in the logging.conf file
 
     ########################
     ### PUBLIC CONSTANTS ###
     ########################
+    FORMATS = {"text": youtubeFormatter, "json": youtubeJsonFormatter}
 
     #######################
     ### PRIVATE OBJECTS ###
     #######################
+    _lock = threading.Lock()
+    _listener = None # This is the background thread that actually writes the log records, shared by every youtubeLogger
+    _handlers = [] # These are the handlers from the logging.conf file that the background thread writes to
 
     ######################
     ### PUBLIC OBJECTS ###
@@ -39,25 +74,55 @@ class youtubeLogger():
     logger = ""
 
     def __init__(self):
+        # Every class creates its own youtubeLogger when it is imported, so the logging.conf file
+        # is not read until something is actually logged, and then only the first time
+        self.logger = logging.getLogger(self._NAME)
+
+    def _getLogger(self):
+        'This method returns the logger, reading the logging.conf file and starting the background writer the first time it is needed'
+        if youtubeLogger._listener is None:
+            with youtubeLogger._lock:
+                if youtubeLogger._listener is None:
+                    self._configure()
+        return self.logger
+
+    def _configure(self):
+        'This method reads the logging.conf file and moves its handlers onto a background thread fed by a queue'
+        import logging.config # This is only needed once, so it isn't worth importing for programs that never log anything
         try:
-            logging.config.fileConfig(self.config)
-            self.logger = logging.getLogger("youtubeDL")
+            logging.config.fileConfig(self.config, disable_existing_loggers=False)
         except KeyError as e:
             # If the conf file is missing or messed up then we'll get an error
             # about the key "formatters" not existing, but it's simply b/c they're gone
             print(f"ERROR: Unable to locate the configuration file: {self.config}!")
             print(f"DEBUG: Error Description: {e}")
             exit(1)
+        logger = logging.getLogger(self._NAME)
+        youtubeLogger._handlers = list(logger.handlers)
+        for handler in youtubeLogger._handlers:
+            logger.removeHandler(handler)
+        log_queue = queue.SimpleQueue()
+        logger.addHandler(youtubeQueueHandler(log_queue))
+        youtubeLogger._listener = logging.handlers.QueueListener(log_queue, *youtubeLogger._handlers, respect_handler_level=True)
+        youtubeLogger._listener.start()
+        # Make sure everything in the queue gets written out before the program exits
+        atexit.register(youtubeLogger._listener.stop)
 
-    def _getCurrentTime(self):
-        'This method is used to get the current time in the appropriate SYSLOG format'
-        # https://strftime.org/
-        return datetime.now().strftime(self._TIME_FORMAT)
+    def setFormat(self, name):
+        'This method switches every log handler over to one of the FORMATS, either "text" (the default) or "json" for one JSON object per line'
+        formatter = self.FORMATS[name]
+        self._getLogger()
+        for handler in youtubeLogger._handlers:
+            old = handler.formatter
+            if old is None:
+                handler.setFormatter(formatter())
+            else:
+                handler.setFormatter(formatter(old._fmt, old.datefmt))
 
-    def logMsg(self, msg):
-        'This method is used to log all messages out to the configured log file and should be used for all standard messages'
-        self.logger.info(f"{self._getCurrentTime()} {self._HOSTNAME} {self._PROGRAM}[{self._PID}] {msg}")
+    def logMsg(self, msg, *args):
+        'This method is used to log all messages out to the configured log file and should be used for all standard messages. Any args are only formatted into the msg with % if the message is going to be written'
+        self._getLogger().info(msg, *args)
 
-    def logDebugMsg(self, msg):
-        'This method is used to log all messages out to the configured log file and should only be used for debugging level messages'
-        self.logger.debug(f"{self._getCurrentTime()} {self._HOSTNAME} {self._PROGRAM}[{self._PID}] {msg}")
+    def logDebugMsg(self, msg, *args):
+        'This method is used to log all messages out to the configured log file and should only be used for debugging level messages. Any args are only formatted into the msg with % if debug logging is turned on'
+        self._getLogger().debug(msg, *args)
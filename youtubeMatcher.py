@@ -0,0 +1,129 @@
+#!/usr/bin/env python3
+from collections import deque
+import re
+
+class youtubeMatcher():
+    'This class serves to support the youtubeDL class by compiling a channel\'s title keywords once so that many titles can be checked against them quickly'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    # Python's own substring search is so fast that checking each keyword one at a time beats an automaton written
+    # in Python until there are a lot of keywords, and the automaton takes about 10us per keyword to build, so it only
+    # pays for itself once a channel has around a thousand keywords and a daemon or backfill checks it against
+    # a few hundred titles (see benchmarks/benchTitleMatch.py)
+    _AUTOMATON_THRESHOLD = 1000
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, titles, exclude=None, ignoreCase=False, regex=False, wholeWord=False):
+        # This raises re.error if regex is True and one of the keywords is not a valid regular expression
+        self._ignoreCase = ignoreCase
+        self._regex = regex
+        self._wholeWord = wholeWord
+        self._include = self._compile(titles)
+        self._exclude = self._compile(exclude)
+
+    def _compile(self, keywords):
+        'This method is used to compile a list of keywords into whichever matcher will check them the fastest, or None if there are no keywords'
+        if keywords is None or len(keywords) == 0:
+            return None
+        if self._regex or self._wholeWord:
+            # Anything fancier than a plain substring check gets compiled into one regular expression
+            parts = []
+            for keyword in keywords:
+                if not self._regex:
+                    keyword = re.escape(keyword)
+                if self._wholeWord:
+                    # \b doesn't work for keywords that start or end with punctuation, so check the neighbouring characters instead
+                    keyword = rf"(?<!\w)(?:{keyword})(?!\w)"
+                parts.append(f"(?:{keyword})")
+            return ("regex", re.compile("|".join(parts), re.IGNORECASE if self._ignoreCase else 0))
+        if self._ignoreCase:
+            keywords = [keyword.casefold() for keyword in keywords]
+        keywords = tuple(dict.fromkeys(keywords)) # This removes any duplicates while keeping the order
+        if len(keywords) >= self._AUTOMATON_THRESHOLD:
+            return ("automaton", self._buildAutomaton(keywords))
+        return ("substring", keywords)
+
+    def _buildAutomaton(self, keywords):
+        'This method is used to build an Aho-Corasick automaton from a list of keywords so that a title can be checked against all of them in a single pass'
+        # https://en.wikipedia.org/wiki/Aho%E2%80%93Corasick_algorithm
+        goto = [{}] # This holds the transitions out of each state, where state 0 is the start
+        output = [False] # This marks which states mean a keyword has been found
+        for keyword in keywords:
+            state = 0
+            for char in keyword:
+                if char not in goto[state]:
+                    goto.append({})
+                    output.append(False)
+                    goto[state][char] = len(goto) - 1
+                state = goto[state][char]
+            output[state] = True
+        fail = [0] * len(goto) # This holds where to fall back to when a state has no transition for the next character
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, target in goto[state].items():
+                queue.append(target)
+                fallback = fail[state]
+                while fallback != 0 and char not in goto[fallback]:
+                    fallback = fail[fallback]
+                if state != 0 and char in goto[fallback]:
+                    fail[target] = goto[fallback][char]
+                output[target] = output[target] or output[fail[target]]
+        return (goto, fail, output[0], output)
+
+    def _search(self, compiled, title):
+        'This method runs a test to see if the given title contains any of the keywords in the compiled matcher'
+        kind, matcher = compiled
+        if kind == "regex":
+            return matcher.search(title) is not None
+        if self._ignoreCase:
+            title = title.casefold()
+        if kind == "substring":
+            for keyword in matcher:
+                if keyword in title:
+                    return True
+            return False
+        goto, fail, empty, output = matcher
+        if empty:
+            # An empty keyword matches every title, the same as a plain substring check
+            return True
+        state = 0
+        for char in title:
+            while state != 0 and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                return True
+        return False
+
+    def matchTitle(self, title):
+        'This method runs a test to see if the given title matches any of the keywords and none of the excluded keywords'
+        if self._exclude is not None and self._search(self._exclude, title):
+            return False
+        if self._include is None:
+            # If there are no titles provided to search, then we just download all new videos
+            return True
+        return self._search(self._include, title)
+
+    def matchTitles(self, titles):
+        'This method runs matchTitle on every title in the given list and returns a list of the results in the same order'
+        return [self.matchTitle(title) for title in titles]
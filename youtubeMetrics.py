@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+from contextlib import contextmanager, nullcontext
+from urllib.parse import urlsplit
+import functools, json, os, threading, time
+
+class youtubeMetrics():
+    'This class serves to support every other class by counting and timing what they do, so that each run can be exported in the Prometheus textfile collector format and as a JSON summary'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PREFIX = "youtubedl_"
+    _BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 300, 900) # These are the histogram buckets in seconds
+    _NULL_TIMER = nullcontext() # This is handed out instead of a real timer when metrics are turned off
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    TEXTFILE = "youtubeDL.prom"
+    SUMMARY = "youtubeDL.json"
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    # Every class creates its own youtubeMetrics, but they all share these so that one export covers everything
+    _lock = threading.Lock()
+    _counters = {}
+    _gauges = {}
+    _histograms = {}
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    enabled = False # Nothing is counted or timed unless this is turned on, so leaving it off costs next to nothing
+
+    def _getKey(self, name, labels):
+        'This method turns a metric name and its labels into the key used to store it'
+        if labels is None:
+            return (self._PREFIX + name, ())
+        return (self._PREFIX + name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    def enable(self):
+        'This method turns metrics on for every class'
+        youtubeMetrics.enabled = True
+
+    def inc(self, name, labels=None, amount=1):
+        'This method adds the given amount to a counter'
+        if not youtubeMetrics.enabled:
+            return
+        key = self._getKey(name, labels)
+        with youtubeMetrics._lock:
+            youtubeMetrics._counters[key] = youtubeMetrics._counters.get(key, 0) + amount
+
+    def set(self, name, value, labels=None):
+        'This method sets a gauge to the given value'
+        if not youtubeMetrics.enabled:
+            return
+        with youtubeMetrics._lock:
+            youtubeMetrics._gauges[self._getKey(name, labels)] = value
+
+    def observe(self, name, value, labels=None):
+        'This method adds one observation (usually a number of seconds) to a histogram'
+        if not youtubeMetrics.enabled:
+            return
+        key = self._getKey(name, labels)
+        with youtubeMetrics._lock:
+            histogram = youtubeMetrics._histograms.get(key)
+            if histogram is None:
+                histogram = {"buckets": [0] * len(self._BUCKETS), "count": 0, "sum": 0.0, "max": 0.0}
+                youtubeMetrics._histograms[key] = histogram
+            for ii in range(len(self._BUCKETS)):
+                if value <= self._BUCKETS[ii]:
+                    histogram["buckets"][ii] += 1
+            histogram["count"] += 1
+            histogram["sum"] += value
+            histogram["max"] = max(histogram["max"], value)
+
+    @contextmanager
+    def _timer(self, name, labels):
+        'This method is used by timer to time the body of a with statement'
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.observe(name, time.monotonic() - start, labels)
+
+    def timer(self, name, labels=None):
+        'This method returns a context manager that adds how long its with statement took to a histogram'
+        if not youtubeMetrics.enabled:
+            return self._NULL_TIMER
+        return self._timer(name, labels)
+
+    @staticmethod
+    def timed(name):
+        'This method is a decorator that adds how long each call of the decorated method took to the method_duration_seconds histogram'
+        def decorator(method):
+            @functools.wraps(method)
+            def wrapper(*args, **kwargs):
+                if not youtubeMetrics.enabled:
+                    return method(*args, **kwargs)
+                with youtubeMetrics().timer("method_duration_seconds", {"method": name}):
+                    return method(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def observeResponse(self, r, *args, **kwargs):
+        'This method counts and times one HTTP response, and can be used directly as a requests response hook'
+        if not youtubeMetrics.enabled:
+            return
+        endpoint = urlsplit(r.url).path.replace("/youtube/v3/", "", 1).lstrip("/")
+        self.inc("http_requests_total", {"endpoint": endpoint, "status": r.status_code})
+        self.observe("http_request_duration_seconds", r.elapsed.total_seconds(), {"endpoint": endpoint})
+
+    def _formatLabels(self, labels, extra=None):
+        'This method formats a set of labels the way Prometheus expects them'
+        labels = list(labels)
+        if extra is not None:
+            labels.append(extra)
+        if len(labels) == 0:
+            return ""
+        values = ",".join('%s="%s"' % (k, v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for k, v in labels)
+        return "{" + values + "}"
+
+    def _writeAtomic(self, path, text):
+        'This method writes the given text to a temporary file and then moves it into place, so nothing ever reads a half written file'
+        temp = f"{path}.{os.getpid()}.tmp"
+        with open(temp, "w") as file:
+            file.write(text)
+        os.replace(temp, path)
+
+    def writeTextfile(self, path):
+        'This method writes every metric to the given file in the Prometheus textfile collector format'
+        # https://github.com/prometheus/node_exporter#textfile-collector
+        lines = []
+        with youtubeMetrics._lock:
+            for kind, metrics in (("counter", youtubeMetrics._counters), ("gauge", youtubeMetrics._gauges)):
+                for name in sorted(set(key[0] for key in metrics)):
+                    lines.append(f"# TYPE {name} {kind}")
+                    for key in sorted(key for key in metrics if key[0] == name):
+                        lines.append(f"{name}{self._formatLabels(key[1])} {metrics[key]}")
+            for name in sorted(set(key[0] for key in youtubeMetrics._histograms)):
+                lines.append(f"# TYPE {name} histogram")
+                for key in sorted(key for key in youtubeMetrics._histograms if key[0] == name):
+                    histogram = youtubeMetrics._histograms[key]
+                    for ii in range(len(self._BUCKETS)):
+                        lines.append(f"{name}_bucket{self._formatLabels(key[1], ('le', str(self._BUCKETS[ii])))} {histogram['buckets'][ii]}")
+                    lines.append(f"{name}_bucket{self._formatLabels(key[1], ('le', '+Inf'))} {histogram['count']}")
+                    lines.append(f"{name}_sum{self._formatLabels(key[1])} {histogram['sum']}")
+                    lines.append(f"{name}_count{self._formatLabels(key[1])} {histogram['count']}")
+        self._writeAtomic(path, "\n".join(lines) + "\n")
+
+    def writeSummary(self, path):
+        'This method writes a JSON summary of every metric to the given file'
+        summary = {"counters": {}, "gauges": {}, "histograms": {}}
+        with youtubeMetrics._lock:
+            for kind, metrics in (("counters", youtubeMetrics._counters), ("gauges", youtubeMetrics._gauges)):
+                for key in sorted(metrics):
+                    summary[kind].setdefault(key[0], []).append({"labels": dict(key[1]), "value": metrics[key]})
+            for key in sorted(youtubeMetrics._histograms):
+                histogram = youtubeMetrics._histograms[key]
+                summary["histograms"].setdefault(key[0], []).append({
+                    "labels": dict(key[1]),
+                    "count": histogram["count"],
+                    "sum": round(histogram["sum"], 6),
+                    "avg": round(histogram["sum"] / histogram["count"], 6),
+                    "max": round(histogram["max"], 6)
+                })
+        self._writeAtomic(path, json.dumps(summary, indent=2) + "\n")
+
+    def export(self, directory):
+        'This method writes both the Prometheus textfile and the JSON summary into the given directory'
+        self.writeTextfile(os.path.join(directory, self.TEXTFILE))
+        self.writeSummary(os.path.join(directory, self.SUMMARY))
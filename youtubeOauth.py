@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
-from urllib.parse import urlencode
+from urllib.parse import urlencode, urlsplit
 from youtubeLogger import youtubeLogger
-import requests, json, os
+from youtubeHttp import youtubeHttp
+import fcntl, json, os, threading, time
 
 class youtubeOauth():
     'This class serves to support the youtubeDL class to get Oauth tokens for the YouTube API'
@@ -15,16 +16,20 @@ class youtubeOauth():
     #########################
     ### PRIVATE CONSTANTS ###
     #########################
-    _PATH = os.path.dirname(os.path.realpath(__file__))
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is where the client secrets and refresh token live, which can be moved (for benchmarks or tests) with the YOUTUBEDL_DATA_DIR environment variable
     _SECRETS_FILE = _PATH + "/client_secrets.json"
     _REFRESH_TOKEN_FILE = _PATH + "/refresh_token.txt"
+    _ACCESS_TOKEN_FILE = _PATH + "/access_token.json" # This holds the current access token and when it expires, so it can be reused by the next run (or another process) until then
+    _LOCK_FILE = _PATH + "/access_token.lock" # Every process takes this lock before it reads, refreshes or saves the tokens so only one of them refreshes at a time
+    _EXPIRY_MARGIN = 300 # An access token is refreshed once it has less than this many seconds left, so it can't expire partway through a run
+    _OAUTH_URL = urlsplit(os.environ.get("YOUTUBEDL_OAUTH_URL", "https://oauth2.googleapis.com")) # This can be pointed at a stand-in server with the YOUTUBEDL_OAUTH_URL environment variable
 
     ########################
     ### PUBLIC CONSTANTS ###
     ########################
     NEW_AUTH = False
-    SCHEME = "https://"
-    BASE_URL = "oauth2.googleapis.com"
+    SCHEME = _OAUTH_URL.scheme + "://"
+    BASE_URL = _OAUTH_URL.netloc
     SCOPE = "https://www.googleapis.com/auth/youtube"
     GRANT_TYPE = "urn:ietf:params:oauth:grant-type:device_code" # https://developers.google.com/youtube/v3/guides/auth/devices#step-4:-poll-googles-authorization-server
 
@@ -34,6 +39,7 @@ class youtubeOauth():
     _client_id = ""
     _client_secret = ""
     _access_token = ""
+    _expires_at = 0 # This is when (in seconds since the epoch) the access token expires, 0 means we don't have one
     _refresh_token = ""
     _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
 
@@ -45,6 +51,9 @@ class youtubeOauth():
     device_codes = [] # https://developers.google.com/youtube/v3/guides/auth/devices#step-2:-handle-the-authorization-server-response
 
     def __init__(self):
+        self._lock = threading.Lock() # The access token is refreshed from a background thread in daemon mode
+        self._refresher = None
+        self._http = youtubeHttp(headers=self.headers) # The OAuth requests get the same timeouts, retries and circuit breaker as the API requests
         try:
             with open(self._SECRETS_FILE, "r") as file:
                 json_data = json.loads(file.readlines()[0])
@@ -64,35 +73,122 @@ class youtubeOauth():
             self.NEW_AUTH = True
             # no exit here as we can just reauth based on what happens
 
+    def _openPrivate(self, path):
+        'This method opens the given file for writing so that only our user can read it, since anyone who can read our tokens can act on the account'
+        file = os.fdopen(os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w")
+        os.chmod(path, 0o600) # os.open only sets the permissions when it creates the file
+        return file
+
+    def _lockTokens(self):
+        'This method takes the lock that is shared with every other process using the same tokens, and returns the file that has to be closed to let it go'
+        file = os.fdopen(os.open(self._LOCK_FILE, os.O_RDWR | os.O_CREAT, 0o600), "r+")
+        fcntl.flock(file, fcntl.LOCK_EX)
+        return file
+
     def _saveRefreshToken(self):
         'This method is used by the pollAuthServer method to save a local copy of the refresh_token so that it can be used to get a new access_token on subsequent runs'
-        with open(self._REFRESH_TOKEN_FILE, "w") as file:
+        with self._openPrivate(self._REFRESH_TOKEN_FILE) as file:
             file.writelines(self._refresh_token)
 
+    def _loadAccessToken(self):
+        'This method reads the access token and its expiry that were saved by the last refresh, by this or any other process'
+        try:
+            with open(self._ACCESS_TOKEN_FILE, "r") as file:
+                json_data = json.load(file)
+            self._access_token = json_data["access_token"]
+            self._expires_at = json_data["expires_at"]
+        except FileNotFoundError:
+            pass
+        except (ValueError, KeyError) as e:
+            self._logger.logDebugMsg("DEBUG: Unable to read the saved access token :: Exception Text: %s", e)
+
+    def _saveAccessToken(self, json_data):
+        'This method is used after a refresh to remember the new access token and when it expires, and to save both so other runs and processes can use them'
+        # The expiry is saved as a wall clock time because the file is shared with other processes and later runs
+        self._access_token = json_data["access_token"]
+        self._expires_at = time.time() + json_data.get("expires_in", 3600)
+        try:
+            # Write to a temporary file first so nothing reading the tokens ever sees half a file
+            with self._openPrivate(self._ACCESS_TOKEN_FILE + ".tmp") as file:
+                json.dump({"access_token": self._access_token, "expires_at": self._expires_at}, file)
+            os.replace(self._ACCESS_TOKEN_FILE + ".tmp", self._ACCESS_TOKEN_FILE)
+        except OSError as e:
+            self._logger.logMsg("ERROR: Unable to save the access token! It will be refreshed again on the next run...")
+            self._logger.logDebugMsg("DEBUG: Access Token File: %s :: Exception Text: %s", self._ACCESS_TOKEN_FILE, e)
+
+    def getExpiresIn(self):
+        'This method returns how many seconds the current access token has left before it expires'
+        return self._expires_at - time.time()
+
+    def getAccessToken(self, margin=None):
+        'This method returns an access token that is good for at least margin (or _EXPIRY_MARGIN) more seconds, only refreshing it if the saved one is about to expire, or returns None if it could not be refreshed'
+        if margin is None:
+            margin = self._EXPIRY_MARGIN
+        if self.getExpiresIn() > margin:
+            return self._access_token
+        with self._lock:
+            lock = self._lockTokens()
+            try:
+                # Another process (or thread) may have refreshed the token while we waited for the lock
+                self._loadAccessToken()
+                if self.getExpiresIn() > margin:
+                    self._logger.logDebugMsg("DEBUG: Using the saved access token, which expires in %.0f seconds", self.getExpiresIn())
+                    return self._access_token
+                self._logger.logMsg("Attempting to refresh the access token...")
+                if not self.refreshAccessToken():
+                    return None
+                return self._access_token
+            finally:
+                lock.close()
+
+    def _refreshInBackground(self):
+        'This method runs on a background thread in daemon mode and refreshes the access token shortly before it expires, so a poll never has to wait for it'
+        while True:
+            # Refresh a while before a poll would have to, or retry in a minute if the last refresh failed
+            time.sleep(max(self.getExpiresIn() - self._EXPIRY_MARGIN * 2, 60))
+            self.getAccessToken(self._EXPIRY_MARGIN * 2)
+
+    def startBackgroundRefresh(self):
+        'This method starts refreshing the access token in the background before it expires, which is only worth doing when we keep running'
+        if self._refresher is None:
+            self._refresher = threading.Thread(target=self._refreshInBackground, name="oauth-refresh", daemon=True)
+            self._refresher.start()
+
+    def _post(self, url, data):
+        'This method sends an HTTP POST request with the given form data to the authorization server and returns the HTTP status code and the parsed response, where the status code is None if no response could be had'
+        try:
+            r = self._http.post(url, data=urlencode(data))
+        except RuntimeError as e:
+            return None, {"error": str(e)}
+        try:
+            return r.status_code, json.loads(r.text)
+        except ValueError:
+            # A proxy or an overloaded server can answer with an HTML error page instead
+            return r.status_code, {"error": r.text}
+
     def requestDeviceAndUserCodes(self):
         'This method sends an HTTP POST request to the authorization server to request Device and User codes for OAuth authentication'
         # https://developers.google.com/youtube/v3/guides/auth/devices#step-1:-request-device-and-user-codes
         endpoint = "/device/code"
         url = self.SCHEME + self.BASE_URL + endpoint
         data = {"client_id": self._client_id, "scope": self.SCOPE}
-        self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}...")
-        r = requests.post(url=url, headers=self.headers, data=urlencode(data))
-        json_data = json.loads(r.text)
-        if r.status_code == 200:
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s...", url)
+        status_code, json_data = self._post(url, data)
+        if status_code == 200:
             self._logger.logMsg("Successfully retrieved device and user codes!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
             # Apparently the .append() method only accepts one argument, and I wanted to
             # try to keep this to one line, so I found this article:
             # https://bobbyhadz.com/blog/python-append-multiple-values-to-list-in-one-line
             self.device_codes.extend([json_data["device_code"], json_data["user_code"], json_data["verification_url"], json_data["interval"]])
             return True
-        elif r.status_code == 403:
-            if json_data["error_code"] == "rate_limit_exceeded":
-                self._logger.logMsg("ERROR: API Quota has been exceeded for this account!")
-                self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
+        elif status_code == 403 and json_data.get("error_code") == "rate_limit_exceeded":
+            self._logger.logMsg("ERROR: API Quota has been exceeded for this account!")
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
+            return False
         else:
             self._logger.logMsg("ERROR: Unable to request Device and User Codes!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
             return False
 
     def displayUserCode(self):
@@ -106,29 +202,28 @@ class youtubeOauth():
         endpoint = "/token"
         url = self.SCHEME + self.BASE_URL + endpoint
         data = {"client_id": self._client_id, "client_secret": self._client_secret, "device_code": self.device_codes[0], "grant_type": self.GRANT_TYPE}
-        self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-        r = requests.post(url=url, headers=self.headers, data=urlencode(data))
-        json_data = json.loads(r.text)
-        if r.status_code == 200:
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+        status_code, json_data = self._post(url, data)
+        if status_code == 200:
             self._logger.logMsg("User has successfully authorized our application!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
-            self._access_token = json_data["access_token"]
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
             self._refresh_token = json_data["refresh_token"]
             self._saveRefreshToken()
+            self._saveAccessToken(json_data)
             return 200 # This signals the end of use for this method
-        elif r.status_code == 428:
-            self._logger.logMsg(f"User has not completed the authorization flow! Will check again in {self.device_codes[3]} seconds...")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Error: {json_data['error']} :: Error Description: {json_data['error_description']}")
+        elif status_code == 428:
+            self._logger.logMsg("User has not completed the authorization flow! Will check again in %s seconds...", self.device_codes[3])
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Error: %s :: Error Description: %s", status_code, json_data.get('error'), json_data.get('error_description'))
             return 428 # This signals that the method should be used again once the specified interval has passed
-        elif r.status_code == 403:
-            self._logger.logMsg(f"ERROR: {json_data['error']} has occurred! Description: {json_data['error_description']}!")
-            if json_data["error"] == "slow_down":
+        elif status_code == 403:
+            self._logger.logMsg("ERROR: %s has occurred! Description: %s!", json_data.get('error'), json_data.get('error_description'))
+            if json_data.get("error") == "slow_down":
                 return 425 # This signals something has gone wrong with the speed of the requests, try tripling the wait time
             else:
                 return 403 # This signals something has gone wrong with the method and probably isn't recoverable
         else:
-            self._logger.logMsg(f"ERROR: Unable to contact YouTube API!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
+            self._logger.logMsg("ERROR: Unable to contact YouTube API!")
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
             return 1 # This signals something has gone wrong with the method and is not recoverable
 
     def refreshAccessToken(self):
@@ -137,15 +232,14 @@ class youtubeOauth():
         endpoint = "/token"
         url = self.SCHEME + self.BASE_URL + endpoint
         data = {"client_id": self._client_id, "client_secret": self._client_secret, "grant_type": "refresh_token", "refresh_token": self._refresh_token}
-        self._logger.logDebugMsg(f"DEBUG: Calling YouTube API via URL: {url}")
-        r = requests.post(url=url, headers=self.headers, data=urlencode(data))
-        json_data = json.loads(r.text)
-        if r.status_code == 200:
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+        status_code, json_data = self._post(url, data)
+        if status_code == 200:
             self._logger.logMsg("Successfully refreshed our Access Token!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Response Text: {json_data}")
-            self._access_token = json_data["access_token"]
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Response Text: %s", status_code, json_data)
+            self._saveAccessToken(json_data)
             return True
         else:
             self._logger.logMsg("ERROR: Unable to refresh our Access Token or unable to contact the YouTube API!")
-            self._logger.logDebugMsg(f"DEBUG: HTTP Response Code: {r.status_code} :: Refresh Token: {self._refresh_token} :: Response Text: {json_data}")
+            self._logger.logDebugMsg("DEBUG: HTTP Response Code: %s :: Refresh Token: %s :: Response Text: %s", status_code, self._refresh_token, json_data)
             return False
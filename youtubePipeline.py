@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeMetrics import youtubeMetrics
+import itertools, queue, threading, time
+
+class youtubePipeline():
+    'This class serves to run the youtubeDL class as a set of overlapping stages (resolve, fetch, filter, enrich, download and rate) connected by bounded queues, so that each matching video is downloaded and rated as soon as it is found'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _DONE = None # This is passed down a queue to tell the stage on the other end that there is no more work coming
+    _LAST = (float("inf"),) # This is what _DONE is sorted by in the download queue, so it comes out after every real video
+    _QUEUE_DEPTH = 2 # Each queue holds this many items per worker on the other end, which stops a fast stage from running too far ahead of a slow one
+    _BATCH_LINGER = 1.0 # This is how many seconds the enrich and rate stages wait for more videos to fill a batch after the first one arrives, since the videos trickle in one channel at a time
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+    _metrics = youtubeMetrics() # Bring in our metrics class so we can see how long each stage spends on each item
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    resolved = 0 # This counts how many uploads Playlist IDs were looked up (each one is saved to the channel database as soon as it is found)
+    stats = {} # This counts how many items made it through each stage
+
+    def __init__(self, ytDL, yto):
+        self._ytDL = ytDL
+        self._yto = yto # The access token is asked for when each batch is rated, so a long run never rates with an expired one
+        self._lock = threading.Lock()
+        self._number = 0 # This numbers each download in the order it starts, for the logs
+        self._fetch_queue = queue.Queue(maxsize=ytDL.max_workers * self._QUEUE_DEPTH)
+        self._filter_queue = queue.Queue(maxsize=ytDL.max_workers * self._QUEUE_DEPTH)
+        self._enrich_queue = queue.Queue(maxsize=ytDL._BATCH_SIZE)
+        # The download queue hands out videos by channel priority and then smallest first, rather than in the order they were found.
+        # Each video goes on it as (key, order, videoId) with its key already worked out, since working out its size can take a while
+        self._download_queue = queue.PriorityQueue(maxsize=ytDL.max_downloads * self._QUEUE_DEPTH)
+        self._order = itertools.count() # This keeps videos that sort the same in the order they arrived
+        self._rate_queue = queue.Queue(maxsize=ytDL._BATCH_SIZE)
+        self._backfill = False # This is turned on by run to go through each channel's whole upload history instead of its recent uploads
+        self.resolved = 0
+        self.stats = {"fetched": 0, "unchanged": 0, "failed": 0, "matched": 0, "held": 0, "downloaded": 0, "rated": 0}
+
+    def _count(self, stat, amount=1):
+        'This method adds to one of the stage counters from any of the worker threads'
+        with self._lock:
+            self.stats[stat] += amount
+        self._metrics.inc("pipeline_items_total", {"stat": stat}, amount)
+
+    def _startStage(self, name, workers, work, inbox, outbox, downstream, unwrap=None):
+        'This method starts the given number of worker threads that each pass items from the inbox queue to the work method until they are told there is no more work, and then tells the downstream workers the same. If the inbox wraps each item, unwrap is called to get it back out'
+        threads = [threading.Thread(target=self._runWorker, args=(name, work, inbox, outbox, unwrap), name=f"{name}-{ii}", daemon=True) for ii in range(workers)]
+        def runStage():
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            for ii in range(downstream):
+                outbox.put(self._DONE)
+        stage = threading.Thread(target=runStage, name=name, daemon=True)
+        stage.start()
+        return stage
+
+    def _runWorker(self, name, work, inbox, outbox, unwrap=None):
+        'This method is the loop each worker thread runs, one item at a time, so that one bad item never stops the rest of the stage'
+        while True:
+            item = inbox.get()
+            if unwrap is not None:
+                item = unwrap(item)
+            if item is self._DONE:
+                break
+            try:
+                with self._metrics.timer("stage_duration_seconds", {"stage": name}):
+                    work(item, outbox)
+            except BaseException as e:
+                self._metrics.inc("stage_errors_total", {"stage": name})
+                self._logger.logMsg("ERROR: The %s stage was unable to process an item!", name)
+                self._logger.logDebugMsg("DEBUG: Stage: %s :: Item: %s :: Exception Text: %s", name, item, e)
+
+    def _resolveStage(self, channels, workers):
+        'This method is the first stage, which passes each channel on to be fetched, looking up any missing uploads Playlist IDs in batches along the way'
+        key, fetch = self._ytDL.getFetcher()
+        pending = []
+        for i in channels:
+            config = self._ytDL.video_data["channels"].get(i)
+            if config is None:
+                continue
+            if key in config.keys():
+                self._fetch_queue.put(i)
+            elif key == "playlistId" and "channelId" in config.keys():
+                pending.append(i)
+                if len(pending) == self._ytDL._BATCH_SIZE:
+                    self._resolve(pending, key)
+                    pending = []
+            else:
+                self._logger.logMsg("The %s is not configured for %s! Skipping this channel...", key, i)
+        if len(pending) > 0:
+            self._resolve(pending, key)
+        for ii in range(workers):
+            self._fetch_queue.put(self._DONE)
+
+    def _resolve(self, channels, key):
+        'This method is used by the resolve stage to look up the uploads Playlist IDs for a batch of channels and pass the ones it found on to be fetched'
+        self._ytDL.requestChannelPlaylistId(channels)
+        for i in channels:
+            if key in self._ytDL.video_data["channels"].get(i, {}).keys():
+                self.resolved += 1
+                self._fetch_queue.put(i)
+
+    def _fetch(self, channel, outbox):
+        'This method is the fetch stage, which gets the recent videos for one channel'
+        if self._backfill:
+            return self._fetchHistory(channel, outbox)
+        key, fetch = self._ytDL.getFetcher()
+        pollTime = self._ytDL._getCurrentTime()
+        try:
+            videos = fetch(channel, self._ytDL.video_data["channels"][channel][key])
+        except BaseException as e:
+            # One bad channel should not throw away the results for every other channel
+            self._ytDL.failed_channels[channel] = str(e)
+            self._count("failed")
+            self._logger.logMsg("ERROR: Unable to get the recent videos for the Channel: %s!", channel)
+            self._logger.logDebugMsg("DEBUG: Channel: %s :: Discovery: %s :: Exception Text: %s", channel, self._ytDL.discovery, e)
+            return
+        if videos is None:
+            # An unchanged response means there is nothing new, so we only need to remember that we checked
+            self._ytDL._ledger.setLastPoll(channel, pollTime)
+            self._count("unchanged")
+            return
+        self._count("fetched")
+        outbox.put((channel, videos, pollTime, None))
+
+    def _fetchHistory(self, channel, outbox):
+        'This method is the fetch stage when backfilling, which passes every page of one channel\'s upload history on to be filtered, starting from wherever the last backfill of the channel stopped'
+        checkpoint = self._ytDL._ledger.getBackfill(channel)
+        if checkpoint is not None and checkpoint["finished"]:
+            self._logger.logMsg("The upload history for %s has already been backfilled! Skipping this channel...", channel)
+            return
+        if self._ytDL._getMatcher(channel) is None:
+            # Every page would be thrown away, and the checkpoint would still move past it
+            self._logger.logMsg("ERROR: Unable to backfill %s until its title keywords are fixed! Skipping this channel...", channel)
+            return
+        pageToken = None
+        if checkpoint is not None:
+            pageToken = checkpoint["pageToken"]
+            self._logger.logMsg("Resuming the backfill for %s after %s pages...", channel, checkpoint["pages"])
+        try:
+            # The filter queue only holds a few pages at a time, so this waits for the filter stage to catch up
+            # rather than reading the whole history into memory first
+            for videos, nextPageToken in self._ytDL.iterUploads(channel, self._ytDL.video_data["channels"][channel]["playlistId"], pageToken):
+                self._count("fetched")
+                outbox.put((channel, videos, None, nextPageToken))
+        except BaseException as e:
+            # The checkpoint is only moved once a page has been filtered, so the next backfill picks up from the last good page
+            self._ytDL.failed_channels[channel] = str(e)
+            self._count("failed")
+            self._logger.logMsg("ERROR: Unable to get the upload history for the Channel: %s!", channel)
+            self._logger.logDebugMsg("DEBUG: Channel: %s :: Page Token: %s :: Exception Text: %s", channel, pageToken, e)
+
+    def _filter(self, item, outbox):
+        'This method is the filter stage, which passes each new video from one channel whose title matches our criteria on to be checked against the download rules'
+        channel, videos, pollTime, nextPageToken = item
+        matches = self._ytDL.parseChannelVideos(channel, videos, pollTime, self._backfill)
+        if self._backfill:
+            # The matches are already in the ledger as queued, so even if we stop before they are
+            # downloaded the next run will pick them up, and the backfill can move on to the next page
+            self._ytDL._ledger.setBackfill(channel, nextPageToken)
+            if nextPageToken is None:
+                self._logger.logMsg("Finished backfilling the upload history for %s!", channel)
+        self._count("matched", len(matches))
+        for video in matches:
+            outbox.put(video)
+
+    def _download(self, videoId, outbox):
+        'This method is the download stage, which downloads one video and passes it on to be rated if it succeeded'
+        with self._lock:
+            self._number += 1
+            number = self._number
+        if self._ytDL.recordDownload(videoId, self._ytDL._downloadVideo(videoId, number)):
+            self._count("downloaded")
+            outbox.put(videoId)
+
+    def _getBatch(self, inbox):
+        'This method waits for the next video on the given queue and returns it along with whatever else arrives in the next _BATCH_LINGER seconds, up to _BATCH_SIZE videos, and whether the stage was told there is no more work'
+        batch = [inbox.get()]
+        deadline = time.monotonic() + self._BATCH_LINGER
+        # Each batch costs the same one API call however many videos are in it, so it is worth waiting a moment for it to fill up
+        while len(batch) < self._ytDL._BATCH_SIZE and batch[-1] is not self._DONE:
+            try:
+                batch.append(inbox.get(timeout=max(deadline - time.monotonic(), 0)))
+            except queue.Empty:
+                break
+        return [video for video in batch if video is not self._DONE], self._DONE in batch
+
+    def _enrichStage(self, downstream):
+        'This method is the stage between filtering and downloading, which looks up the matching videos in batches of whatever arrives within _BATCH_LINGER seconds, up to _BATCH_SIZE at a time, and passes the ones that pass their channel\'s download rules on to be downloaded'
+        done = False
+        while not done:
+            batch, done = self._getBatch(self._enrich_queue)
+            if len(batch) > 0:
+                try:
+                    with self._metrics.timer("stage_duration_seconds", {"stage": "enrich"}):
+                        downloads = self._ytDL.enrichMatches(batch)
+                except BaseException as e:
+                    # The videos are still queued in the ledger, so they will be checked again on the next run
+                    self._metrics.inc("stage_errors_total", {"stage": "enrich"})
+                    self._logger.logMsg("ERROR: The enrich stage was unable to process a batch of videos!")
+                    self._logger.logDebugMsg("DEBUG: Video IDs: %s :: Exception Text: %s", batch, e)
+                    continue
+                self._count("held", len(batch) - len(downloads))
+                # The sizes are looked up here, before the videos go on the download queue, so the download workers never wait on them
+                keys = self._ytDL.getDownloadKeys(downloads)
+                for video in downloads:
+                    self._download_queue.put((keys[video], next(self._order), video))
+        for ii in range(downstream):
+            self._download_queue.put((self._LAST, next(self._order), self._DONE))
+
+    def _rateStage(self):
+        'This method is the last stage, which rates the downloaded videos in batches of whatever arrives within _BATCH_LINGER seconds, up to _BATCH_SIZE at a time, so the rating pre-check can still be done in bulk'
+        done = False
+        while not done:
+            batch, done = self._getBatch(self._rate_queue)
+            if len(batch) > 0:
+                try:
+                    with self._metrics.timer("stage_duration_seconds", {"stage": "rate"}):
+                        self._count("rated", self._ytDL.rateVideos(self._yto.getAccessToken(), batch))
+                except BaseException as e:
+                    self._metrics.inc("stage_errors_total", {"stage": "rate"})
+                    self._logger.logMsg("ERROR: The rate stage was unable to process a batch of videos!")
+                    self._logger.logDebugMsg("DEBUG: Video IDs: %s :: Exception Text: %s", batch, e)
+
+    def _queueLeftovers(self):
+        'This method passes the videos a previous run left downloaded but not rated, or queued or waiting but not downloaded, on to the stage they were waiting on'
+        leftovers = self._ytDL._ledger.getVideos(self._ytDL._ledger.DOWNLOADED)
+        if len(leftovers) > 0:
+            self._logger.logMsg("Found %s videos left in the rating queue from a previous run!", len(leftovers))
+        for video in leftovers:
+            self._rate_queue.put(video)
+        # These are checked against the download rules again, since a live stream may have ended or a video been taken down since
+        leftovers = self._ytDL._ledger.getVideos(self._ytDL._ledger.QUEUED) + self._ytDL._ledger.getVideos(self._ytDL._ledger.WAITING)
+        if len(leftovers) > 0:
+            self._logger.logMsg("Found %s videos left in the download queue from a previous run!", len(leftovers))
+        for video in leftovers:
+            self._enrich_queue.put(video)
+
+    def run(self, channels=None, backfill=False, leftovers=True):
+        'This method runs every stage of the pipeline for the given list of channels (or every channel in the config) and waits for all of them to finish. With backfill, every video in each channel\'s upload history is checked instead of only the new ones, and without leftovers the videos left over from a previous run are left for someone else'
+        self._backfill = backfill
+        if channels is None:
+            channels = list(self._ytDL.video_data["channels"].keys())
+        start = time.monotonic()
+        fetch_workers = self._ytDL.max_workers
+        download_workers = self._ytDL.max_downloads
+        # The stages are started from the end of the pipeline back to the start, so that
+        # every stage is already waiting for work by the time anything reaches it
+        rate = threading.Thread(target=self._rateStage, name="rate", daemon=True)
+        rate.start()
+        enrich = threading.Thread(target=self._enrichStage, args=(download_workers,), name="enrich", daemon=True)
+        enrich.start()
+        stages = [
+            self._startStage("download", download_workers, self._download, self._download_queue, self._rate_queue, 1, unwrap=lambda item: item[2]),
+            enrich,
+            self._startStage("filter", 1, self._filter, self._filter_queue, self._enrich_queue, 1),
+            self._startStage("fetch", fetch_workers, self._fetch, self._fetch_queue, self._filter_queue, 1)
+        ]
+        # Anything left over from a previous run goes straight to the stage it was waiting on
+        if leftovers:
+            self._queueLeftovers()
+        self._resolveStage(channels, fetch_workers)
+        for stage in reversed(stages):
+            stage.join()
+        rate.join()
+        duration = time.monotonic() - start
+        self._metrics.observe("pipeline_duration_seconds", duration)
+        self._metrics.set("pipeline_channels", len(channels))
+        self._logger.logMsg("Finished checking %s channels in %.2f seconds!", len(channels), duration)
+        self._logger.logMsg("Fetched: %s :: Unchanged: %s :: Failed: %s :: Matched: %s :: Held: %s :: Downloaded: %s :: Rated: %s", self.stats['fetched'], self.stats['unchanged'], self.stats['failed'], self.stats['matched'], self.stats['held'], self.stats['downloaded'], self.stats['rated'])
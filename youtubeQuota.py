@@ -0,0 +1,141 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from youtubeMetrics import youtubeMetrics
+from datetime import datetime
+import sqlite3, hashlib, os, threading
+
+class youtubeQuota():
+    'This class serves to support the youtubeDL class by keeping an on-disk record of how many YouTube API quota units we have spent on each endpoint each day, so that expensive calls can be put off before we run out'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _TIMEZONE = "America/Los_Angeles" # The YouTube API quota resets at midnight Pacific Time
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    # https://developers.google.com/youtube/v3/determine_quota_cost
+    COSTS = {
+        "search": 100,
+        "videos/rate": 50,
+        "videos/getRating": 1,
+        "videos": 1,
+        "channels": 1,
+        "playlistItems": 1
+    }
+    DEFAULT_COST = 1 # Anything not listed above is assumed to be a simple list call
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+    _metrics = youtubeMetrics() # Bring in our metrics class so quota spend shows up alongside everything else
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    daily_quota = 10000 # This is the default daily quota for a Google Cloud project, change it if yours has been raised
+    key_count = 1 # This is how many API keys share the work, each from its own Google Cloud project with its own daily_quota
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The API requests are made from worker threads
+        self._reserved = 0 # This is how many quota units are set aside for calls that have been handed to a worker thread but not finished yet
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS quota (day TEXT NOT NULL, endpoint TEXT NOT NULL, units INTEGER NOT NULL, calls INTEGER NOT NULL, PRIMARY KEY (day, endpoint))")
+                # The keys are saved as a fingerprint rather than as themselves, so the database can't be used to get them back
+                self._db.execute("CREATE TABLE IF NOT EXISTS keyQuota (day TEXT NOT NULL, keyId TEXT NOT NULL, units INTEGER NOT NULL, calls INTEGER NOT NULL, PRIMARY KEY (day, keyId))")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the quota database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getDay(self):
+        'This method returns the current quota day, which rolls over at midnight Pacific Time'
+        import pytz # This is imported the first time it is needed so that commands which never spend quota don't load it
+        return datetime.now(pytz.timezone(self._TIMEZONE)).strftime("%Y-%m-%d")
+
+    def getCost(self, endpoint, calls=1):
+        'This method returns how many quota units the given number of calls to the given endpoint will cost'
+        return self.COSTS.get(endpoint, self.DEFAULT_COST) * calls
+
+    def getKeyId(self, key):
+        'This method returns the fingerprint the given API key is tracked by'
+        return hashlib.sha256(key.encode()).hexdigest()[:12]
+
+    def spend(self, endpoint, calls=1, key=None):
+        'This method records the quota units spent on the given number of calls to the given endpoint, and against the given API key if there is one'
+        day = self._getDay()
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO quota (day, endpoint, units, calls) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (day, endpoint) DO UPDATE SET units = units + excluded.units, calls = calls + excluded.calls",
+                (day, endpoint, self.getCost(endpoint, calls), calls)
+            )
+            if key is not None:
+                self._db.execute(
+                    "INSERT INTO keyQuota (day, keyId, units, calls) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (day, keyId) DO UPDATE SET units = units + excluded.units, calls = calls + excluded.calls",
+                    (day, self.getKeyId(key), self.getCost(endpoint, calls), calls)
+                )
+        self._metrics.inc("quota_units_total", {"endpoint": endpoint}, self.getCost(endpoint, calls))
+
+    def getSpent(self):
+        'This method returns a dictionary of how many quota units have been spent on each endpoint today'
+        with self._lock:
+            rows = self._db.execute("SELECT endpoint, units FROM quota WHERE day = ?", (self._getDay(),)).fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def getKeySpent(self, keys):
+        'This method returns a dictionary of how many quota units have been spent with each of the given API keys today'
+        with self._lock:
+            rows = self._db.execute("SELECT keyId, units FROM keyQuota WHERE day = ?", (self._getDay(),)).fetchall()
+        spent = {row[0]: row[1] for row in rows}
+        return {key: spent.get(self.getKeyId(key), 0) for key in keys}
+
+    def pickKey(self, keys):
+        'This method returns whichever of the given API keys has the most quota left today, which spreads the calls (from every worker) evenly across the keys'
+        spent = self.getKeySpent(keys)
+        return min(keys, key=lambda key: spent[key])
+
+    def reserve(self, endpoint, calls=1):
+        'This method sets aside the quota units for the given number of calls to the given endpoint, so calls that are queued up but not sent yet are counted against what we have left'
+        with self._lock:
+            self._reserved += self.getCost(endpoint, calls)
+
+    def settle(self, endpoint, calls=1):
+        'This method gives back the quota units set aside by reserve once the calls have finished, by which point spend has recorded what they really cost'
+        with self._lock:
+            self._reserved -= self.getCost(endpoint, calls)
+
+    def getRemaining(self):
+        'This method returns how many quota units we have left for today, across all of the API keys, less anything set aside for calls that have not finished yet'
+        return self.daily_quota * self.key_count - sum(self.getSpent().values()) - self._reserved
+
+    def canAfford(self, endpoint, calls=1, reserve=0):
+        'This method runs a test to see if we can make the given number of calls to the given endpoint and still have the reserve left over for cheaper, more important calls'
+        return self.getRemaining() - self.getCost(endpoint, calls) >= reserve
+
+    def projectSpend(self, calls):
+        'This method takes a dictionary of endpoint: number of calls and returns how many quota units those calls would cost in total'
+        return sum(self.getCost(endpoint, calls[endpoint]) for endpoint in calls)
+
+    def logReport(self):
+        'This method logs how many quota units have been spent on each endpoint today and how many are left'
+        spent = self.getSpent()
+        for endpoint in sorted(spent):
+            self._logger.logMsg("Quota spent today on %s: %s units", endpoint, spent[endpoint])
+        self._logger.logMsg("Quota spent today: %s of %s units, %s units remaining", sum(spent.values()), self.daily_quota * self.key_count, self.getRemaining())
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timedelta
+from urllib.parse import quote
+import sqlite3, json, os, re, threading
+
+class youtubeResolver():
+    'This class serves to support the youtubeDL class by turning channel names into Channel IDs as cheaply as possible, trying exact lookups before falling back to a search, and remembering both what it found and what it could not find'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _TIME_FORMAT = "%Y-%m-%dT%H:%M:%S" # This is the same format the youtubeDL class uses for timestamps
+    _CHANNEL_ID = re.compile(r"UC[0-9A-Za-z_-]{22}") # Every Channel ID looks like this, so a name that does is checked as an ID first
+    _FOUND_TTL = timedelta(days=30) # Handles can be changed or given up, so even a good answer is checked again now and then
+    _NOT_FOUND_TTL = timedelta(days=7) # A name that could not be found is not looked up again for this long
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, ytDL, db_file=None):
+        self._ytDL = ytDL # This is the youtubeDL class, whose API helpers and quota we share
+        if db_file is None:
+            db_file = self._DB_FILE
+        self._lock = threading.Lock() # The exact lookups are made from worker threads
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            with self._db:
+                # A row with no channelId means we looked and could not find the channel
+                self._db.execute("CREATE TABLE IF NOT EXISTS resolutions (name TEXT PRIMARY KEY, channelId TEXT, method TEXT NOT NULL, expiresAt TEXT NOT NULL)")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the resolver database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getCurrentTime(self):
+        'This method gets the current time in the same format the youtubeDL class uses'
+        return datetime.now().strftime(self._TIME_FORMAT)
+
+    def getCached(self, names):
+        'This method returns {name: channelId} for every given name we have an answer for that has not expired yet, where the channelId is None if we could not find the channel'
+        cached = {}
+        now = self._getCurrentTime()
+        with self._lock:
+            for start in range(0, len(names), 500): # SQLite limits how many values can be passed to one query
+                batch = names[start:start + 500]
+                rows = self._db.execute(f"SELECT name, channelId FROM resolutions WHERE expiresAt > ? AND name IN ({','.join('?' * len(batch))})", [now] + batch).fetchall()
+                cached.update({row[0]: row[1] for row in rows})
+        return cached
+
+    def save(self, name, channelId, method):
+        'This method remembers the answer for the given name, which is a Channel ID or None if the channel could not be found'
+        ttl = self._FOUND_TTL if channelId is not None else self._NOT_FOUND_TTL
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT INTO resolutions (name, channelId, method, expiresAt) VALUES (?, ?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET channelId = excluded.channelId, method = excluded.method, expiresAt = excluded.expiresAt",
+                (name, channelId, method, (datetime.now() + ttl).strftime(self._TIME_FORMAT))
+            )
+
+    def _callApi(self, endpoint):
+        'This method makes a GET request to the given YouTube API endpoint and returns the parsed response, or raises an exception on failure'
+        url = self._ytDL.SCHEME + self._ytDL.BASE_URL + endpoint + f"&key={self._ytDL._getApiKey()}"
+        self._logger.logDebugMsg("DEBUG: Calling YouTube API via URL: %s", url)
+        status_code, text, unchanged = self._ytDL._apiGet(url)
+        if status_code != 200:
+            raise RuntimeError(f"HTTP Response Code: {status_code} :: Response Text: {text}")
+        return json.loads(text)
+
+    def _checkIds(self, names):
+        'This method is used by resolve to check names that look like Channel IDs, up to _BATCH_SIZE per API call, and returns {name: channelId or None}'
+        # https://developers.google.com/youtube/v3/docs/channels/list
+        results = {}
+        for start in range(0, len(names), self._ytDL._BATCH_SIZE):
+            batch = names[start:start + self._ytDL._BATCH_SIZE]
+            json_data = self._callApi(f"/youtube/v3/channels?part=id&maxResults={self._ytDL._BATCH_SIZE}&id={','.join(batch)}")
+            found = set(item["id"] for item in json_data.get("items", []))
+            for i in batch:
+                results[i] = i if i in found else None
+        return results
+
+    def _lookupExact(self, name):
+        'This method is used by resolve to look the given name up as a handle and then as a legacy username, which cost 1 quota unit each, and returns the Channel ID or None'
+        # https://developers.google.com/youtube/v3/docs/channels/list#forHandle
+        handle = name if name.startswith("@") else "@" + name
+        for parameter, value in (("forHandle", handle), ("forUsername", name.lstrip("@"))):
+            items = self._callApi(f"/youtube/v3/channels?part=id&{parameter}={quote(value)}").get("items", [])
+            if len(items) > 0:
+                return items[0]["id"], parameter
+        return None, None
+
+    def _search(self, name):
+        'This method is used by resolve to search for the given name, which costs 100 quota units, and returns the Channel ID of the first channel in the results or None'
+        # https://developers.google.com/youtube/v3/docs/search/list
+        json_data = self._callApi(f"/youtube/v3/search?part=snippet&type=channel&maxResults=5&q={quote(name)}")
+        for item in json_data.get("items", []):
+            if item["id"]["kind"] == "youtube#channel":
+                return item["id"]["channelId"]
+        return None
+
+    def resolve(self, names):
+        'This method finds the Channel IDs for the given channel names in one pass, from the cheapest way to the most expensive, and returns {name: channelId or None} for every name it has an answer for. Names that are left out could not be looked up this time and should be tried again later'
+        results = self.getCached(names)
+        for i in results:
+            self._logger.logDebugMsg("DEBUG: Channel: %s :: Cached Channel ID: %s", i, results[i])
+        pending = [i for i in names if i not in results]
+
+        # Names that are already Channel IDs only need to be checked, and 50 of them can be checked for 1 unit
+        ids = [i for i in pending if self._CHANNEL_ID.fullmatch(i)]
+        if len(ids) > 0:
+            try:
+                for i, channelId in self._checkIds(ids).items():
+                    results[i] = channelId
+                    self.save(i, channelId, "id")
+            except BaseException as e:
+                self._logger.logMsg("ERROR: Unable to check the Channel IDs in the config!")
+                self._logger.logDebugMsg("DEBUG: Channel IDs: %s :: Exception Text: %s", ids, e)
+        pending = [i for i in pending if i not in ids]
+
+        # Handles and usernames can't have spaces in them, so only names without spaces are worth an exact lookup
+        exact = [i for i in pending if not any(c.isspace() for c in i)]
+        with ThreadPoolExecutor(max_workers=self._ytDL.max_workers) as executor:
+            jobs = {executor.submit(self._lookupExact, i): i for i in exact}
+            for job in as_completed(jobs):
+                i = jobs[job]
+                try:
+                    channelId, method = job.result()
+                except BaseException as e:
+                    self._logger.logMsg("ERROR: Unable to look up the Channel ID for %s!", i)
+                    self._logger.logDebugMsg("DEBUG: Channel: %s :: Exception Text: %s", i, e)
+                    pending.remove(i) # Try again on the next run rather than paying for a search
+                    continue
+                if channelId is not None:
+                    self._logger.logMsg("Successfully found the YouTube Channel ID with the name: %s!", i)
+                    self._logger.logDebugMsg("DEBUG: Channel: %s :: Lookup: %s :: Channel ID: %s", i, method, channelId)
+                    results[i] = channelId
+                    self.save(i, channelId, method)
+                    pending.remove(i)
+
+        # Anything left over can only be found by searching, which is by far the most expensive call we make
+        for i in pending:
+            if not self._ytDL._quota.canAfford("search", reserve=self._ytDL._getPollingReserve()):
+                # Put the search off until tomorrow rather than risk not being able to poll the channels we already have
+                self._logger.logMsg("WARNING: Not enough quota remaining to search for %s! Will try again once the quota resets...", i)
+                continue
+            try:
+                channelId = self._search(i)
+            except BaseException as e:
+                self._logger.logMsg("ERROR: Unable to contact YouTube API or process request/response!")
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Exception Text: %s", i, e)
+                continue
+            if channelId is not None:
+                self._logger.logMsg("Successfully found the YouTube Channel ID with the name: %s!", i)
+                self._logger.logDebugMsg("DEBUG: Channel: %s :: Lookup: search :: Channel ID: %s", i, channelId)
+            results[i] = channelId
+            self.save(i, channelId, "search")
+        return results
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+import re
+
+class youtubeRules():
+    'This class serves to support the youtubeDL class by checking the details the YouTube API has about a video (its length, whether it is live, who can watch it and its quality) against a channel\'s download rules before the video is handed off to yt-dlp'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    # https://developers.google.com/youtube/v3/docs/videos#contentDetails.duration
+    _DURATION = re.compile(r"P(?:(\d+)W)?(?:(\d+)D)?(?:T(?:(\d+)H)?(?:(\d+)M)?(?:(\d+)S)?)?")
+    _DURATION_UNITS = (604800, 86400, 3600, 60, 1) # This is how many seconds are in each of the weeks, days, hours, minutes and seconds of a duration
+    _LIVE = ("none", "upcoming", "live", "completed") # These are the only values the live rule understands
+    _DEFINITIONS = ("hd", "sd")
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    # These are what a check can decide about a video
+    DOWNLOAD = "download" # The video passes every rule
+    WAIT = "wait" # The video can't be downloaded yet (it hasn't finished streaming or processing) but it might pass once it has
+    SKIP = "skip" # The video will never pass the rules
+    DEFAULT_LIVE = ["none", "completed"] # Live streams and premieres are downloaded once they are over, never while they are still going
+    DEFAULT_AVAILABILITY = ["public", "unlisted"]
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+
+    def __init__(self, minDuration=None, maxDuration=None, live=None, availability=None, definition=None):
+        # This raises ValueError if one of the rules is not something we understand
+        self._minDuration = None if minDuration is None else int(minDuration)
+        self._maxDuration = None if maxDuration is None else int(maxDuration)
+        self._live = list(self.DEFAULT_LIVE if live is None else live)
+        self._availability = list(self.DEFAULT_AVAILABILITY if availability is None else availability)
+        self._definition = definition
+        for status in self._live:
+            if status not in self._LIVE:
+                raise ValueError(f"{status} is not one of {', '.join(self._LIVE)}")
+        if definition is not None and definition not in self._DEFINITIONS:
+            raise ValueError(f"{definition} is not one of {', '.join(self._DEFINITIONS)}")
+
+    @classmethod
+    def fromConfig(cls, config):
+        'This method builds the rules from the minDuration, maxDuration, live, availability and definition keys in a channel\'s config'
+        return cls(config.get("minDuration"), config.get("maxDuration"), config.get("live"), config.get("availability"), config.get("definition"))
+
+    @classmethod
+    def parseDuration(cls, duration):
+        'This method turns an ISO 8601 duration from the YouTube API (such as PT1H2M3S) into a number of seconds, or returns None if it is not a duration'
+        match = cls._DURATION.fullmatch(duration or "")
+        if match is None:
+            return None
+        return sum(int(value or 0) * unit for value, unit in zip(match.groups(), cls._DURATION_UNITS))
+
+    @staticmethod
+    def getLiveStatus(video):
+        'This method works out whether the given video is a live stream or premiere that is "upcoming", "live" right now or "completed", or "none" if it was never live'
+        # https://developers.google.com/youtube/v3/docs/videos#liveStreamingDetails
+        details = video.get("liveStreamingDetails")
+        if details is None:
+            return "none"
+        if "actualEndTime" in details:
+            return "completed"
+        if "actualStartTime" in details:
+            return "live"
+        return "upcoming"
+
+    def check(self, video):
+        'This method checks the details the videos endpoint returned for a video (or None if it returned nothing, which means the video is gone or private) against the rules, and returns what to do with it and why'
+        if video is None:
+            return self.SKIP, "the video could not be found"
+        status = video.get("status", {})
+        privacy = status.get("privacyStatus")
+        if privacy not in self._availability:
+            return self.SKIP, f"the video is {privacy}"
+        if status.get("uploadStatus", "processed") == "uploaded":
+            # The video has been uploaded but YouTube is still processing it, so there is nothing to download yet
+            return self.WAIT, "the video is still processing"
+        if status.get("uploadStatus", "processed") != "processed":
+            return self.SKIP, f"the video upload is {status.get('uploadStatus')}"
+        live = self.getLiveStatus(video)
+        if live not in self._live:
+            if live in ("upcoming", "live") and "completed" in self._live:
+                return self.WAIT, f"the video is {live}"
+            return self.SKIP, f"the live status of the video is {live}"
+        content = video.get("contentDetails", {})
+        duration = self.parseDuration(content.get("duration"))
+        if live in ("none", "completed") and duration is not None:
+            if self._minDuration is not None and duration < self._minDuration:
+                return self.SKIP, f"the video is only {duration} seconds long"
+            if self._maxDuration is not None and duration > self._maxDuration:
+                return self.SKIP, f"the video is {duration} seconds long"
+        if self._definition is not None and content.get("definition") != self._definition:
+            return self.SKIP, f"the video is {content.get('definition')} instead of {self._definition}"
+        return self.DOWNLOAD, "the video passes every rule"
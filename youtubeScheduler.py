@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from datetime import datetime
+import time
+
+class youtubeScheduler():
+    'This class serves to support daemon mode by working out how often each channel should be polled based on how often it has uploaded in the past'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _TIME_FORMAT = "%Y-%m-%dT%H:%M:%S" # This is the same format the youtubeDL class uses for timestamps
+    _HISTORY = 20 # This is how many of each channel's most recent uploads we learn its cadence from
+    _POLLS_PER_UPLOAD = 4 # This is how many times we want to poll a channel in the typical gap between its uploads
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    DEFAULT_INTERVAL = 3600 # This is how often we poll a channel we don't know enough about yet
+    MIN_INTERVAL = 600 # Even the most active channel won't be polled more often than this
+    MAX_INTERVAL = 86400 # Even the most dormant channel will be polled at least this often
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    next_poll = {} # This maps each channel to the time (in seconds since the epoch) it should next be polled
+
+    def __init__(self, ledger, channels):
+        self._ledger = ledger
+        self.next_poll = {}
+        for i in channels:
+            # Pick up where we left off, so restarting the daemon doesn't poll everything at once
+            lastPoll = self._ledger.getLastPoll(i)
+            if lastPoll is None:
+                self.next_poll[i] = time.time()
+            else:
+                self.next_poll[i] = self._convertTime(lastPoll) + self.getInterval(i)
+
+    def _convertTime(self, timestamp):
+        'This method is used to convert a timestamp in string format to seconds since the epoch so we can do math on it'
+        return datetime.strptime(str(timestamp), self._TIME_FORMAT).timestamp()
+
+    def getInterval(self, channel):
+        'This method returns how many seconds to wait between polls of the given channel, based on the gaps between its recent uploads'
+        history = [self._convertTime(i) for i in self._ledger.getPublishTimes(channel, self._HISTORY)]
+        if len(history) < 2:
+            return self.DEFAULT_INTERVAL
+        gaps = sorted(history[ii] - history[ii + 1] for ii in range(len(history) - 1))
+        typical = gaps[len(gaps) // 2] # The median gap isn't thrown off by the odd burst of uploads or long break
+        quiet = time.time() - history[0]
+        if quiet > typical * 2:
+            # The channel has gone quiet for longer than usual, so slowly back off
+            typical = quiet
+        return int(min(max(typical / self._POLLS_PER_UPLOAD, self.MIN_INTERVAL), self.MAX_INTERVAL))
+
+    def getDueChannels(self):
+        'This method returns a list of every channel that is due to be polled now'
+        now = time.time()
+        return [i for i in self.next_poll if self.next_poll[i] <= now]
+
+    def schedule(self, channel):
+        'This method works out when the given channel should next be polled, which should be called right after polling it'
+        interval = self.getInterval(channel)
+        self.next_poll[channel] = time.time() + interval
+        self._logger.logDebugMsg("DEBUG: Channel: %s :: Poll Interval: %ss", channel, interval)
+
+    def getSleepTime(self):
+        'This method returns how many seconds to sleep until the next channel is due to be polled'
+        if len(self.next_poll) == 0:
+            return self.DEFAULT_INTERVAL
+        return max(min(self.next_poll.values()) - time.time(), 0)
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+from youtubeLogger import youtubeLogger
+from youtubeDatabase import youtubeDatabase
+from datetime import datetime
+import sqlite3, os, socket, threading, time
+
+class youtubeWorkQueue():
+    'This class serves to support coordinator and worker mode by handing the channels out to any number of worker processes through a table in the shared database, where each worker leases a few channels at a time and a channel whose worker dies is handed to another worker once its lease runs out'
+
+    # Note that there are no "private" objects or methods in the
+    # Python class structure, but it is generally accepted that
+    # methods and objects with a single "_" (underscore) preceding
+    # the name indicates something "not to be messed with". So I'm
+    # adopting that convention to denote "private" objects and methods
+
+    #########################
+    ### PRIVATE CONSTANTS ###
+    #########################
+    _PATH = os.environ.get("YOUTUBEDL_DATA_DIR", os.path.dirname(os.path.realpath(__file__))) # This is the same data directory the youtubeDL class uses
+    _DB_FILE = _PATH + "/youtubeDL.db"
+    _LEASE_TIME = float(os.environ.get("YOUTUBEDL_LEASE_TIME", "300")) # This is how many seconds a worker has a channel for before another worker can take it, unless it renews the lease, which can be shortened (for benchmarks or tests) with the YOUTUBEDL_LEASE_TIME environment variable
+    _MAX_ATTEMPTS = 3 # This is how many times a channel is handed out before we give up on it for this round
+    _POLL_TIME = 5 # This is the longest a worker with nothing to do waits before checking whether the round is over or a lease has run out
+
+    ########################
+    ### PUBLIC CONSTANTS ###
+    ########################
+    # These are the states a channel moves through in each round
+    PENDING = "pending" # The channel is waiting for a worker
+    LEASED = "leased" # A worker is working on the channel
+    DONE = "done" # The channel has been checked and its videos downloaded
+    FAILED = "failed" # The channel could not be checked after _MAX_ATTEMPTS tries
+    RENEW_INTERVAL = _LEASE_TIME / 3 # This is how often a worker renews its leases, which leaves it two more chances if one renewal is held up
+
+    #######################
+    ### PRIVATE OBJECTS ###
+    #######################
+    _logger = youtubeLogger() # Bring in our custom logging class to standardize log location and formatting
+
+    ######################
+    ### PUBLIC OBJECTS ###
+    ######################
+    owner = "" # This names this worker in the leases it takes, as the host and process ID, so a lease can be traced back to who holds it
+
+    def __init__(self, db_file=None):
+        if db_file is None:
+            db_file = self._DB_FILE
+        self.owner = f"{socket.gethostname()}:{os.getpid()}"
+        self._lock = threading.Lock() # The leases are renewed from a background thread
+        try:
+            self._db = sqlite3.connect(db_file, timeout=youtubeDatabase.BUSY_TIMEOUT, check_same_thread=False)
+            # Write-ahead logging lets the workers keep reading the database while another one is writing to it,
+            # and it is a setting of the database file itself, so every connection in every process gets it
+            self._db.execute("PRAGMA journal_mode=WAL")
+            with self._db:
+                self._db.execute("CREATE TABLE IF NOT EXISTS work (channel TEXT PRIMARY KEY, state TEXT NOT NULL, owner TEXT, leaseUntil REAL, attempts INTEGER NOT NULL DEFAULT 0, updatedAt TEXT NOT NULL)")
+                self._db.execute("CREATE INDEX IF NOT EXISTS work_state ON work (state, leaseUntil)")
+        except sqlite3.Error as e:
+            self._logger.logMsg("ERROR: Unable to open the work queue database: %s! Cannot continue!", db_file)
+            self._logger.logDebugMsg("DEBUG: Exception Text: %s", e)
+            exit(1)
+
+    def _getCurrentTime(self):
+        'This method gets the current time in the same format the youtubeDL class uses'
+        return datetime.now().strftime("%Y-%m-%dT%H:%M:%S")
+
+    def enqueue(self, channels):
+        'This method starts a new round by putting every given channel in the queue to be checked, and dropping anything left from the last round'
+        with self._lock, self._db:
+            self._db.execute("DELETE FROM work")
+            self._db.executemany("INSERT INTO work (channel, state, updatedAt) VALUES (?, ?, ?)", [(i, self.PENDING, self._getCurrentTime()) for i in channels])
+
+    def claim(self, limit):
+        'This method leases up to the given number of channels to this worker, either ones no one has taken yet or ones whose lease has run out, and returns them'
+        now = time.time()
+        with self._lock, self._db:
+            # A channel that keeps losing its worker is given up on rather than handed out forever
+            self._db.execute(
+                "UPDATE work SET state = ?, owner = NULL, leaseUntil = NULL, updatedAt = ? WHERE state = ? AND leaseUntil < ? AND attempts >= ?",
+                (self.FAILED, self._getCurrentTime(), self.LEASED, now, self._MAX_ATTEMPTS)
+            )
+            # A single UPDATE is atomic, so two workers can never lease the same channel at the same time
+            self._db.execute(
+                "UPDATE work SET state = ?, owner = ?, leaseUntil = ?, attempts = attempts + 1, updatedAt = ? WHERE channel IN "
+                "(SELECT channel FROM work WHERE state = ? OR (state = ? AND leaseUntil < ?) ORDER BY attempts, rowid LIMIT ?)",
+                (self.LEASED, self.owner, now + self._LEASE_TIME, self._getCurrentTime(), self.PENDING, self.LEASED, now, limit)
+            )
+            rows = self._db.execute("SELECT channel FROM work WHERE state = ? AND owner = ?", (self.LEASED, self.owner)).fetchall()
+        return [row[0] for row in rows]
+
+    def renew(self):
+        'This method extends the leases on every channel this worker is still working on'
+        with self._lock, self._db:
+            self._db.execute("UPDATE work SET leaseUntil = ? WHERE state = ? AND owner = ?", (time.time() + self._LEASE_TIME, self.LEASED, self.owner))
+
+    def finish(self, channel):
+        'This method records that the given channel has been checked'
+        with self._lock, self._db:
+            self._db.execute("UPDATE work SET state = ?, owner = NULL, leaseUntil = NULL, updatedAt = ? WHERE channel = ?", (self.DONE, self._getCurrentTime(), channel))
+
+    def fail(self, channel):
+        'This method puts the given channel back in the queue for another worker to try, or gives up on it once it has been tried _MAX_ATTEMPTS times'
+        with self._lock, self._db:
+            self._db.execute(
+                "UPDATE work SET state = CASE WHEN attempts >= ? THEN ? ELSE ? END, owner = NULL, leaseUntil = NULL, updatedAt = ? WHERE channel = ?",
+                (self._MAX_ATTEMPTS, self.FAILED, self.PENDING, self._getCurrentTime(), channel)
+            )
+
+    def getCounts(self):
+        'This method returns how many channels are in each state in the current round'
+        with self._lock:
+            rows = self._db.execute("SELECT state, COUNT(*) FROM work GROUP BY state").fetchall()
+        return {row[0]: row[1] for row in rows}
+
+    def isFinished(self):
+        'This method runs a test to see if every channel in the current round has been checked or given up on'
+        counts = self.getCounts()
+        return counts.get(self.PENDING, 0) + counts.get(self.LEASED, 0) == 0
+
+    def getWaitTime(self):
+        'This method returns how many seconds a worker with nothing to do should wait before asking again, which is until the next lease held by another worker runs out or _POLL_TIME, whichever comes first'
+        with self._lock:
+            row = self._db.execute("SELECT MIN(leaseUntil) FROM work WHERE state = ?", (self.LEASED,)).fetchone()
+        if row[0] is None:
+            return 1
+        return min(max(row[0] - time.time(), 1), self._POLL_TIME)